@@ -0,0 +1,124 @@
+"""
+This module:
+- Calculates bootstrap confidence intervals of the average of a metric,
+where all resamples of a group are drawn at once, as a matrix
+of indices with one row per resample, instead of one by one.
+- Calculates these intervals for each group of a table
+and for each metric column, optionally in a pool of processes.
+- Takes a seed, from which a separate random generator is derived
+for each group and metric, so the intervals are the same
+for the same seed, regardless of the number of processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Largest number of indices drawn at once, to bound memory use
+MAX_BATCH_ELEMENTS = 10_000_000
+
+def get_bootstrap_interval(
+    values_: Iterable[float],
+    resample_count_: int = 10_000,
+    confidence_: float = 0.95,
+    seed_: Union[int, np.random.SeedSequence, None] = None
+) -> tuple[float, float, float]:
+    """
+    Returns the average of the values, along with the lower and upper
+    bound of its percentile bootstrap confidence interval,
+    calculated from 'resample_count_' resamples of the values.
+    The resamples are drawn as a matrix of indices, in batches of rows
+    that hold at most MAX_BATCH_ELEMENTS indices.
+    Missing values are left out, and if there are no values left,
+    all three results are NaN.
+    """
+
+    assert 0 < confidence_ < 1, "Confidence has to be between 0 and 1"
+    assert resample_count_ > 0, "At least one resample has to be drawn"
+    t_values: np.ndarray = np.asarray(values_, dtype=np.float64)
+    t_values = t_values[~np.isnan(t_values)]
+    if t_values.size == 0:
+        return np.nan, np.nan, np.nan
+
+    t_generator: np.random.Generator = np.random.default_rng(seed_)
+    t_batch_size: int = max(1, MAX_BATCH_ELEMENTS // t_values.size)
+    t_resample_averages: np.ndarray = np.concatenate([
+        t_values[t_generator.integers(
+            0, t_values.size,
+            size=(min(t_batch_size, resample_count_ - batch_start_), t_values.size)
+        )].mean(axis=1)
+        for batch_start_ in range(0, resample_count_, t_batch_size)
+    ])
+    t_lower, t_upper = np.quantile(
+        t_resample_averages, [(1 - confidence_) / 2, (1 + confidence_) / 2]
+    )
+    return float(t_values.mean()), float(t_lower), float(t_upper)
+
+def _get_bootstrap_interval_of_task(
+    task_: tuple[np.ndarray, int, float, np.random.SeedSequence]
+) -> tuple[float, float, float]:
+    """
+    Unpacks the arguments of 'get_bootstrap_interval',
+    so it can be mapped over tasks in a pool of processes.
+    """
+
+    return get_bootstrap_interval(*task_)
+
+def get_bootstrap_intervals_per_group(
+    data_: pd.DataFrame,
+    metric_columns_: list[str],
+    group_column_: str,
+    resample_count_: int = 10_000,
+    confidence_: float = 0.95,
+    seed_: Union[int, np.random.SeedSequence, None] = None,
+    worker_count_: int = 1
+) -> pd.DataFrame:
+    """
+    For each group of the column 'group_column_', and for each metric
+    column, calculates the average and its bootstrap confidence interval
+    with 'get_bootstrap_interval'.
+    If 'worker_count_' is more than one, the groups and metrics are
+    distributed among a pool of that many processes.
+    The seed may be a SeedSequence spawned by the caller,
+    so separate calls can draw independent resamples.
+    Returns a DataFrame with one row per group, and columns
+    'mean', 'lower' and 'upper' for each metric column.
+    """
+
+    t_groups: list[tuple[object, pd.DataFrame]] = list(
+        data_.groupby(group_column_)
+    )
+    t_seed_sequence: np.random.SeedSequence = seed_ \
+        if isinstance(seed_, np.random.SeedSequence) else np.random.SeedSequence(seed_)
+    t_seeds: list[np.random.SeedSequence] = t_seed_sequence.spawn(
+        len(t_groups) * len(metric_columns_)
+    )
+    t_tasks: list[tuple[np.ndarray, int, float, np.random.SeedSequence]] = [
+        (group_data_[metric_column_].to_numpy(dtype=np.float64),
+         resample_count_, confidence_, task_seed_)
+        for (_, group_data_), metric_column_, task_seed_ in zip(
+            [group_ for group_ in t_groups for _ in metric_columns_],
+            metric_columns_ * len(t_groups),
+            t_seeds
+        )
+    ]
+
+    if worker_count_ > 1 and len(t_tasks) > 1:
+        with ProcessPoolExecutor(min(worker_count_, len(t_tasks))) as executor_:
+            t_intervals: list[tuple[float, float, float]] = list(
+                executor_.map(_get_bootstrap_interval_of_task, t_tasks)
+            )
+    else:
+        t_intervals = list(map(_get_bootstrap_interval_of_task, t_tasks))
+
+    return pd.DataFrame(
+        np.asarray(t_intervals, dtype=np.float64).reshape(
+            len(t_groups), len(metric_columns_) * 3
+        ),
+        index=pd.Index([key_ for key_, _ in t_groups], name=group_column_),
+        columns=pd.MultiIndex.from_product(
+            [metric_columns_, ['mean', 'lower', 'upper']]
+        )
+    )
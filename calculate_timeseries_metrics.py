@@ -1,5 +1,10 @@
+from __future__ import annotations
+
 import statistics as stat
-import pandas as pd
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 def calculate_moving_average(
     sequence_: pd.Series, exponential_: bool = False
@@ -0,0 +1,368 @@
+"""
+This module:
+- Calculates the co-expression of probes, or of genes, across samples
+from 'MicroarrayExpression.csv', as the Pearson correlation
+of their expression values, without holding the whole correlation
+matrix in memory.
+- Standardizes the expression matrix once, so that each row has
+a mean of 0 and a norm of 1, and is stored as float32.
+The correlations of two blocks of rows are then the matrix product
+of the blocks, which NumPy calculates with BLAS.
+- For each row, keeps either its 'partner_count_' most correlated
+rows, merging the candidates of each tile into the best ones so far
+with a partial sort, or all pairs above a correlation threshold.
+- Processes blocks of rows in a pool of threads, as BLAS
+and the partial sorts release the GIL, and writes the results
+of each block to disk as soon as it and the blocks before it are done.
+- When run as a script, through function 'main', writes the top
+partners of every probe (or gene, with option '-g') to a .npy file,
+or the pairs above the threshold set by option '-t' to a CSV file,
+at the path passed as the first argument. The samples can be limited
+to those of the structure acronyms passed as further arguments.
+
+Rows with the same value in every sample have no correlation,
+and are standardized to zeros, so their correlation with every
+other row is 0.
+"""
+
+import os
+import sys
+import csv
+import getopt
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from probe_tools import ProbeCatalog
+
+# Rows (and columns) of a tile of the correlation matrix calculated at once
+DEFAULT_BLOCK_SIZE = 1024
+
+def get_standardized_rows(values_: np.ndarray) -> np.ndarray:
+    """
+    Returns the rows of the matrix centered to a mean of 0
+    and scaled to a norm of 1, as float32, so that the dot product
+    of two rows is their Pearson correlation.
+    Rows without variance become zeros.
+    """
+
+    t_centered: np.ndarray = np.asarray(values_, dtype=np.float64)
+    t_centered = t_centered - t_centered.mean(axis=1, keepdims=True)
+    t_norms: np.ndarray = np.linalg.norm(t_centered, axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(t_norms > 0, t_centered / t_norms, 0).astype(np.float32)
+
+def read_standardized_expression(
+    expression_path_: str,
+    sample_columns_: Optional[Iterable[int]] = None,
+    chunk_size_: Optional[int] = None,
+    probe_catalog_: Optional[ProbeCatalog] = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads the file 'MicroarrayExpression.csv' at the given path,
+    and returns the IDs of its rows, along with the rows standardized
+    by 'get_standardized_rows'.
+    If 'sample_columns_' is given, only the columns of these samples
+    are read, which are their row positions in 'SampleAnnot.csv'.
+    If 'chunk_size_' is given, the file is read that many rows at a time.
+    Without 'probe_catalog_', the rows are probes, and the IDs are
+    probe IDs. With it, the rows are genes, each being the average
+    of the probes of the gene, and the IDs are gene IDs,
+    in ascending order.
+    """
+
+    # The first column of the file holds the probe IDs
+    t_used_columns: Optional[list[int]] = None if sample_columns_ is None \
+        else np.union1d([0], np.asarray(list(sample_columns_), dtype=int) + 1).tolist()
+    t_chunks: Iterable[pd.DataFrame] = pd.read_csv(
+        expression_path_, header=None, usecols=t_used_columns, chunksize=chunk_size_
+    ) if chunk_size_ else [pd.read_csv(
+        expression_path_, header=None, usecols=t_used_columns
+    )]
+
+    if probe_catalog_ is None:
+        # Rows are standardized on their own, so each chunk is done separately
+        t_probe_ids: list[np.ndarray] = []
+        t_rows: list[np.ndarray] = []
+        for chunk_ in t_chunks:
+            t_probe_ids.append(chunk_.iloc[:, 0].to_numpy(dtype=np.int64))
+            t_rows.append(get_standardized_rows(chunk_.iloc[:, 1:].to_numpy()))
+        return np.concatenate(t_probe_ids), np.concatenate(t_rows)
+
+    # Sums and probe counts of each gene are added up over the chunks
+    t_gene_ids: np.ndarray = np.unique(probe_catalog_.gene_ids)
+    t_sums: Optional[np.ndarray] = None
+    t_counts: np.ndarray = np.zeros(t_gene_ids.size, dtype=np.int64)
+    for chunk_ in t_chunks:
+        t_gene_rows: np.ndarray = np.searchsorted(
+            t_gene_ids,
+            probe_catalog_.get_gene_ids(chunk_.iloc[:, 0].to_numpy(dtype=np.int64))
+        )
+        if t_sums is None:
+            t_sums = np.zeros((t_gene_ids.size, chunk_.shape[1] - 1))
+        np.add.at(t_sums, t_gene_rows, chunk_.iloc[:, 1:].to_numpy(dtype=np.float64))
+        t_counts += np.bincount(t_gene_rows, minlength=t_gene_ids.size)
+    t_measured: np.ndarray = t_counts > 0
+    return t_gene_ids[t_measured], get_standardized_rows(
+        t_sums[t_measured] / t_counts[t_measured, np.newaxis]
+    )
+
+def _get_tile_scores(
+    correlations_: np.ndarray,
+    absolute_: bool
+) -> np.ndarray:
+    """
+    Returns the values correlations are ranked by,
+    where the correlations of rows with themselves are NaN,
+    and rank last.
+    """
+
+    t_scores: np.ndarray = np.abs(correlations_) if absolute_ else correlations_
+    return np.where(np.isnan(t_scores), -np.inf, t_scores)
+
+def _get_tile(
+    standardized_: np.ndarray,
+    row_start_: int,
+    row_end_: int,
+    column_start_: int,
+    column_end_: int
+) -> np.ndarray:
+    """
+    Returns the correlations between two blocks of rows,
+    where the correlation of a row with itself is set to NaN.
+    """
+
+    t_tile: np.ndarray = \
+        standardized_[row_start_:row_end_] @ standardized_[column_start_:column_end_].T
+    t_diagonal: np.ndarray = np.arange(
+        max(row_start_, column_start_), min(row_end_, column_end_)
+    )
+    t_tile[t_diagonal - row_start_, t_diagonal - column_start_] = np.nan
+    return t_tile
+
+def get_block_top_partners(
+    standardized_: np.ndarray,
+    row_start_: int,
+    row_end_: int,
+    partner_count_: int,
+    block_size_: int = DEFAULT_BLOCK_SIZE,
+    absolute_: bool = False
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the row positions of the 'partner_count_' rows
+    most correlated with each row between 'row_start_' and 'row_end_',
+    along with their correlations, as two matrices with
+    a row for each row, ordered from the most correlated partner.
+    The correlations are calculated one tile of 'block_size_' columns
+    at a time, and the candidates of each tile are merged into the best
+    ones found so far with a partial sort, so the memory used does not
+    depend on the number of rows.
+    If 'absolute_' is True, rows are ranked by the absolute value
+    of their correlation, so negatively correlated rows are kept too.
+    """
+
+    t_row_count: int = row_end_ - row_start_
+    t_partners: np.ndarray = np.empty((t_row_count, 0), dtype=np.int64)
+    t_correlations: np.ndarray = np.empty((t_row_count, 0), dtype=np.float32)
+    for column_start_ in range(0, standardized_.shape[0], block_size_):
+        t_column_end: int = min(column_start_ + block_size_, standardized_.shape[0])
+        t_correlations = np.concatenate((t_correlations, _get_tile(
+            standardized_, row_start_, row_end_, column_start_, t_column_end
+        )), axis=1)
+        t_partners = np.concatenate((t_partners, np.broadcast_to(
+            np.arange(column_start_, t_column_end), (t_row_count, t_column_end - column_start_)
+        )), axis=1)
+        if t_partners.shape[1] > partner_count_:
+            t_kept: np.ndarray = np.argpartition(
+                -_get_tile_scores(t_correlations, absolute_), partner_count_ - 1, axis=1
+            )[:, :partner_count_]
+            t_partners = np.take_along_axis(t_partners, t_kept, axis=1)
+            t_correlations = np.take_along_axis(t_correlations, t_kept, axis=1)
+
+    t_order: np.ndarray = np.argsort(
+        -_get_tile_scores(t_correlations, absolute_), axis=1, kind='stable'
+    )
+    return (
+        np.take_along_axis(t_partners, t_order, axis=1),
+        np.take_along_axis(t_correlations, t_order, axis=1)
+    )
+
+def get_block_correlated_pairs(
+    standardized_: np.ndarray,
+    row_start_: int,
+    row_end_: int,
+    threshold_: float,
+    block_size_: int = DEFAULT_BLOCK_SIZE,
+    absolute_: bool = False
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the row positions of the pairs, where the first row
+    is between 'row_start_' and 'row_end_', the second one comes after it,
+    and their correlation is at least the threshold,
+    along with their correlations, as three arrays.
+    Each pair is returned once, from the block of its first row,
+    so only the tiles on and after the diagonal are calculated.
+    If 'absolute_' is True, the absolute value of the correlation
+    is compared to the threshold.
+    """
+
+    t_first_rows: list[np.ndarray] = [np.empty(0, dtype=np.int64)]
+    t_second_rows: list[np.ndarray] = [np.empty(0, dtype=np.int64)]
+    t_correlations: list[np.ndarray] = [np.empty(0, dtype=np.float32)]
+    for column_start_ in range(row_start_, standardized_.shape[0], block_size_):
+        t_column_end: int = min(column_start_ + block_size_, standardized_.shape[0])
+        t_tile: np.ndarray = _get_tile(
+            standardized_, row_start_, row_end_, column_start_, t_column_end
+        )
+        t_first, t_second = np.nonzero(
+            (_get_tile_scores(t_tile, absolute_) >= threshold_)
+            & (np.arange(column_start_, t_column_end) > np.arange(row_start_, row_end_)[:, np.newaxis])
+        )
+        t_first_rows.append(t_first + row_start_)
+        t_second_rows.append(t_second + column_start_)
+        t_correlations.append(t_tile[t_first, t_second])
+    return (
+        np.concatenate(t_first_rows),
+        np.concatenate(t_second_rows),
+        np.concatenate(t_correlations)
+    )
+
+def write_top_partners(
+    standardized_: np.ndarray,
+    ids_: np.ndarray,
+    output_path_: Union[str, Path],
+    partner_count_: int = 10,
+    block_size_: int = DEFAULT_BLOCK_SIZE,
+    absolute_: bool = False,
+    worker_count_: Optional[int] = None
+) -> Path:
+    """
+    Writes the top partners of every row, found with
+    'get_block_top_partners', to a .npy file, which holds
+    a structured array with a record for each row, with the fields
+    - 'id': the ID of the row.
+    - 'partner_ids': the IDs of its partners, from the most correlated.
+    - 'correlations': the correlations with these partners.
+    The file is created at its full size first, and the records of
+    each block of rows are written into it when they are done,
+    from a pool of 'worker_count_' threads.
+    Returns the path of the file.
+    """
+
+    t_partner_count: int = min(partner_count_, standardized_.shape[0] - 1)
+    assert t_partner_count > 0, "At least two rows and one partner are needed"
+    t_output_path: Path = Path(output_path_)
+    t_records: np.memmap = np.lib.format.open_memmap(
+        t_output_path, mode='w+', shape=(standardized_.shape[0],), dtype=[
+            ('id', np.int64),
+            ('partner_ids', np.int64, (t_partner_count,)),
+            ('correlations', np.float32, (t_partner_count,))
+        ]
+    )
+    t_records['id'] = ids_
+
+    t_row_starts: range = range(0, standardized_.shape[0], block_size_)
+    with ThreadPoolExecutor(worker_count_ or os.cpu_count() or 1) as executor_:
+        for row_start_, (partners_, correlations_) in zip(t_row_starts, executor_.map(
+            lambda row_start_: get_block_top_partners(
+                standardized_, row_start_,
+                min(row_start_ + block_size_, standardized_.shape[0]),
+                t_partner_count, block_size_, absolute_
+            ),
+            t_row_starts
+        )):
+            t_rows: slice = slice(row_start_, row_start_ + partners_.shape[0])
+            t_records['partner_ids'][t_rows] = ids_[partners_]
+            t_records['correlations'][t_rows] = correlations_
+    t_records.flush()
+    return t_output_path
+
+def write_correlated_pairs(
+    standardized_: np.ndarray,
+    ids_: np.ndarray,
+    output_path_: Union[str, Path],
+    threshold_: float,
+    block_size_: int = DEFAULT_BLOCK_SIZE,
+    absolute_: bool = False,
+    worker_count_: Optional[int] = None
+) -> int:
+    """
+    Writes the pairs of rows correlated at least as much as the threshold,
+    found with 'get_block_correlated_pairs', to a CSV file with columns
+    'id_a', 'id_b' and 'correlation', where the pairs of each block
+    of rows are appended when they are done,
+    from a pool of 'worker_count_' threads.
+    Returns the number of pairs written.
+    """
+
+    t_pair_count: int = 0
+    t_row_starts: range = range(0, standardized_.shape[0], block_size_)
+    with open(output_path_, 'w', newline='', encoding='UTF-8') as output_, \
+            ThreadPoolExecutor(worker_count_ or os.cpu_count() or 1) as executor_:
+        t_writer = csv.writer(output_)
+        t_writer.writerow(['id_a', 'id_b', 'correlation'])
+        for first_rows_, second_rows_, correlations_ in executor_.map(
+            lambda row_start_: get_block_correlated_pairs(
+                standardized_, row_start_,
+                min(row_start_ + block_size_, standardized_.shape[0]),
+                threshold_, block_size_, absolute_
+            ),
+            t_row_starts
+        ):
+            t_writer.writerows(zip(
+                ids_[first_rows_].tolist(),
+                ids_[second_rows_].tolist(),
+                correlations_.tolist()
+            ))
+            t_pair_count += first_rows_.size
+    return t_pair_count
+
+def main(argv_: Optional[list[str]] = None) -> None:
+    """
+    Gathers the values of the command line arguments, where
+    - '-k' sets the number of partners kept per row (10 by default).
+    - '-t' sets a threshold instead, writing all pairs above it.
+    - '-a' ranks by the absolute value of the correlation.
+    - '-g' correlates genes instead of probes.
+    - '-b', '-j' and '-c' set the block size, the number of threads,
+    and the number of rows of the file read at a time.
+    The first argument is the output path, the rest are structure acronyms.
+    """
+
+    from data_access import get_data_path, load_probes, load_sample_annotations
+    from differential_expression import get_structure_sample_columns
+
+    external_parameters = getopt.getopt(
+        sys.argv[1:] if argv_ is None else argv_, "k:t:agb:j:c:"
+    )
+    options: dict[str, str] = dict(external_parameters[0])
+    output_path: str = external_parameters[1][0]
+    structure_acronyms: list[str] = external_parameters[1][1:]
+    block_size: int = int(options.get('-b', DEFAULT_BLOCK_SIZE))
+    worker_count: Optional[int] = int(options['-j']) if '-j' in options else None
+
+    ids, standardized_expression = read_standardized_expression(
+        get_data_path("expression"),
+        get_structure_sample_columns(load_sample_annotations(), structure_acronyms)
+        if structure_acronyms else None,
+        int(options['-c']) if '-c' in options else None,
+        ProbeCatalog(load_probes()) if '-g' in options else None
+    )
+    if '-t' in options:
+        pair_count: int = write_correlated_pairs(
+            standardized_expression, ids, output_path, float(options['-t']),
+            block_size, '-a' in options, worker_count
+        )
+        print(f"Wrote {pair_count} pairs to file {output_path}")
+    else:
+        write_top_partners(
+            standardized_expression, ids, output_path, int(options.get('-k', 10)),
+            block_size, '-a' in options, worker_count
+        )
+        print(f"Wrote top partners of {ids.size} rows to file {output_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+This module:
+- Resolves the locations of the datasets used by the analysis scripts,
+from environment variables or a JSON configuration file,
+instead of paths written into the scripts.
+- Loads the datasets, where each file is parsed once per process,
+and the parsed DataFrame is returned again on later calls,
+as long as the file did not change.
+At most as many DataFrames are kept as set by the environment variable
+ASSIGNMENT_DATA_CACHE_SIZE (8 by default),
+dropping the least recently used one first.
+
+The location of a dataset is taken from the first of these that is set:
+- The environment variable of the dataset, listed in DATASET_VARIABLES.
+- The entry of the dataset in the configuration file.
+- The file name of the dataset, listed in DATASET_FILE_NAMES,
+in the directory set by the environment variable ASSIGNMENT_DATA_DIR,
+or by the entry "data_directory" in the configuration file,
+or else in the current working directory.
+The configuration file is read from the path set by the environment
+variable ASSIGNMENT_DATA_CONFIG, or from 'data_paths.json'
+in the current working directory, if it exists.
+Relative paths in the configuration file are resolved
+from the directory of the configuration file.
+"""
+
+import os
+import json
+from pathlib import Path
+from functools import lru_cache
+from typing import Optional, Union, Iterable, Any
+
+import pandas as pd
+
+from workbook_cache import load_workbooks
+
+DATASET_FILE_NAMES: dict[str, str] = {
+    'probes': "Probes.csv",
+    'sample_annotations': "SampleAnnot.csv",
+    'expression': "MicroarrayExpression.csv",
+    'pa_calls': "PACall.csv",
+    'flea_data': "DaMN.xlsx"
+}
+DATASET_VARIABLES: dict[str, str] = {
+    'probes': "PROBES_CSV",
+    'sample_annotations': "SAMPLE_ANNOT_CSV",
+    'expression': "MICROARRAY_EXPRESSION_CSV",
+    'pa_calls': "PA_CALL_CSV",
+    'flea_data': "DAMN_XLSX"
+}
+
+def read_configuration() -> tuple[dict[str, Any], Path]:
+    """
+    Returns the content of the configuration file,
+    along with the directory relative paths in it are resolved from.
+    If there is no configuration file, returns an empty dictionary
+    and the current working directory.
+    """
+
+    t_path: Path = Path(
+        os.environ.get("ASSIGNMENT_DATA_CONFIG", "data_paths.json")
+    ).expanduser()
+    if not t_path.is_file():
+        return {}, Path.cwd()
+    with open(t_path, 'r', encoding='UTF-8') as file_:
+        return json.load(file_), t_path.resolve().parent
+
+def get_data_path(dataset_: str) -> Path:
+    """
+    Returns the location of a dataset, by its key in DATASET_FILE_NAMES.
+    """
+
+    assert dataset_ in DATASET_FILE_NAMES, \
+        f"Dataset has to be one of {list(DATASET_FILE_NAMES)}"
+    if DATASET_VARIABLES[dataset_] in os.environ:
+        return Path(os.environ[DATASET_VARIABLES[dataset_]]).expanduser()
+
+    t_configuration, t_configuration_directory = read_configuration()
+    if dataset_ in t_configuration:
+        return t_configuration_directory / Path(t_configuration[dataset_]).expanduser()
+    t_directory: Path = Path(os.environ["ASSIGNMENT_DATA_DIR"]).expanduser() \
+        if "ASSIGNMENT_DATA_DIR" in os.environ \
+        else t_configuration_directory / Path(
+            t_configuration.get("data_directory", ".")
+        ).expanduser()
+    return t_directory / DATASET_FILE_NAMES[dataset_]
+
+@lru_cache(maxsize=int(os.environ.get("ASSIGNMENT_DATA_CACHE_SIZE", 8)))
+def _read_data(
+    paths_: tuple[str, ...],
+    modification_times_: tuple[int, ...],
+    header_: Optional[int],
+    sheet_name_: Optional[str],
+    workbook_options_: tuple[Optional[str], int]
+) -> pd.DataFrame:
+    """
+    Parses the files at the given paths, where the modification times
+    are only part of the arguments, so that a changed file
+    is not served from the cache.
+    Workbooks are read with 'load_workbooks', with the cache directory
+    and worker count in 'workbook_options_',
+    any other file is read as a single CSV file.
+    """
+
+    if sheet_name_ is not None:
+        return load_workbooks(paths_, sheet_name_, *workbook_options_)
+    return pd.read_csv(paths_[0], header=header_)
+
+def load_data(
+    paths_: Iterable[Union[str, Path]],
+    header_: Optional[int] = 0,
+    sheet_name_: Optional[str] = None,
+    workbook_cache_directory_: Optional[str] = None,
+    worker_count_: int = 1
+) -> pd.DataFrame:
+    """
+    Returns the DataFrame of the given files, parsed only if
+    the same files were not loaded before with the same options.
+    If 'sheet_name_' is given, the files are read as workbooks.
+    The same DataFrame object is returned to every caller,
+    so it should not be modified in place.
+    """
+
+    t_paths: tuple[str, ...] = tuple(str(Path(path_).resolve()) for path_ in paths_)
+    return _read_data(
+        t_paths,
+        tuple(os.stat(path_).st_mtime_ns for path_ in t_paths),
+        header_,
+        sheet_name_,
+        (workbook_cache_directory_, worker_count_)
+    )
+
+def clear_cache() -> None:
+    """
+    Drops all loaded DataFrames.
+    """
+
+    _read_data.cache_clear()
+
+def load_probes() -> pd.DataFrame:
+    """
+    Returns the content of 'Probes.csv'.
+    """
+
+    return load_data([get_data_path('probes')])
+
+def load_sample_annotations() -> pd.DataFrame:
+    """
+    Returns the content of 'SampleAnnot.csv'.
+    """
+
+    return load_data([get_data_path('sample_annotations')])
+
+def load_expression_matrix() -> pd.DataFrame:
+    """
+    Returns the content of 'MicroarrayExpression.csv',
+    which has no header, and stores the probe IDs in its first column.
+    """
+
+    return load_data([get_data_path('expression')], header_=None)
+
+def load_pa_calls() -> pd.DataFrame:
+    """
+    Returns the content of 'PACall.csv',
+    which has no header, and stores the probe IDs in its first column.
+    """
+
+    return load_data([get_data_path('pa_calls')], header_=None)
+
+def load_flea_data(
+    workbook_paths_: Optional[Iterable[Union[str, Path]]] = None,
+    sheet_name_: str = "Sheet1",
+    workbook_cache_directory_: Optional[str] = None,
+    worker_count_: int = 1
+) -> pd.DataFrame:
+    """
+    Returns the rows of a sheet of the given workbooks,
+    or of 'DaMN.xlsx' if none are given,
+    loaded in a pool of 'worker_count_' processes.
+    """
+
+    return load_data(
+        workbook_paths_ or [get_data_path('flea_data')],
+        sheet_name_=sheet_name_,
+        workbook_cache_directory_=workbook_cache_directory_,
+        worker_count_=worker_count_
+    )
@@ -0,0 +1,141 @@
+"""
+This module:
+- Compares the expression of every probe between two groups of samples,
+where a group is made of all samples from 'SampleAnnot.csv'
+that have any of the given values in column 'structure_acronym',
+the same way prep_progr_assessment4.py selects its samples.
+- Calculates for each probe, for both groups, the mean and variance,
+and between the groups, the Welch t-statistic, its degrees of freedom
+and the log fold change, on the whole expression matrix at once.
+- Can read 'MicroarrayExpression.csv' in row chunks, where only
+the columns of the compared samples are read, for matrices that
+do not fit in memory. As all statistics are calculated per probe,
+the results of the chunks are the same as those of the whole matrix.
+"""
+
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+def get_structure_sample_columns(
+    samples_data_: pd.DataFrame,
+    structure_acronyms_: Iterable[str]
+) -> np.ndarray:
+    """
+    Returns the positions of the rows in 'SampleAnnot.csv'
+    that have any of the given structure acronyms,
+    which are the column positions of these samples
+    in the expression matrix without its probe ID column.
+    """
+
+    return np.flatnonzero(
+        samples_data_['structure_acronym'].isin(list(structure_acronyms_))
+    )
+
+def get_differential_expression(
+    expression_: np.ndarray,
+    group_a_columns_: Iterable[int],
+    group_b_columns_: Iterable[int],
+    probe_ids_: Optional[Iterable[int]] = None,
+    log_transformed_: bool = True
+) -> pd.DataFrame:
+    """
+    From an expression matrix, where rows are probes and columns
+    are samples, returns a DataFrame with one row per probe, containing
+    - 'mean_a', 'variance_a', 'mean_b', 'variance_b':
+    mean and sample variance of the probe's expression in each group.
+    - 't_statistic', 'degrees_of_freedom':
+    Welch's t-statistic of the difference between the group means,
+    and its Welch-Satterthwaite degrees of freedom.
+    - 'log_fold_change': log2 of the ratio of the group means.
+    If 'log_transformed_' is True, the expression values are taken
+    as log2 values already, so this is the difference of the means.
+    Each group has to contain at least two samples.
+    Probes that have zero variance in both groups get NaN statistics.
+    """
+
+    t_matrix: np.ndarray = np.asarray(expression_, dtype=np.float64)
+    t_group_a: np.ndarray = t_matrix[:, list(group_a_columns_)]
+    t_group_b: np.ndarray = t_matrix[:, list(group_b_columns_)]
+    assert t_group_a.shape[1] > 1 and t_group_b.shape[1] > 1, \
+        "Both groups have to contain at least two samples"
+
+    t_mean_a: np.ndarray = t_group_a.mean(axis=1)
+    t_mean_b: np.ndarray = t_group_b.mean(axis=1)
+    t_variance_a: np.ndarray = t_group_a.var(axis=1, ddof=1)
+    t_variance_b: np.ndarray = t_group_b.var(axis=1, ddof=1)
+    t_standard_error_a: np.ndarray = t_variance_a / t_group_a.shape[1]
+    t_standard_error_b: np.ndarray = t_variance_b / t_group_b.shape[1]
+    t_standard_error: np.ndarray = t_standard_error_a + t_standard_error_b
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_statistic: np.ndarray = (t_mean_a - t_mean_b) / np.sqrt(t_standard_error)
+        t_degrees_of_freedom: np.ndarray = t_standard_error ** 2 / (
+            t_standard_error_a ** 2 / (t_group_a.shape[1] - 1)
+            + t_standard_error_b ** 2 / (t_group_b.shape[1] - 1)
+        )
+        t_log_fold_change: np.ndarray = t_mean_a - t_mean_b if log_transformed_ \
+            else np.log2(t_mean_a / t_mean_b)
+    t_no_variance: np.ndarray = t_standard_error == 0
+    t_statistic[t_no_variance] = np.nan
+    t_degrees_of_freedom[t_no_variance] = np.nan
+
+    return pd.DataFrame({
+        'mean_a': t_mean_a,
+        'variance_a': t_variance_a,
+        'mean_b': t_mean_b,
+        'variance_b': t_variance_b,
+        't_statistic': t_statistic,
+        'degrees_of_freedom': t_degrees_of_freedom,
+        'log_fold_change': t_log_fold_change
+    }, index=pd.Index(
+        probe_ids_ if probe_ids_ is not None else range(t_matrix.shape[0]),
+        name='probe_id'
+    ))
+
+def get_differential_expression_between_structures(
+    expression_path_: str,
+    samples_data_: pd.DataFrame,
+    structure_acronyms_a_: Iterable[str],
+    structure_acronyms_b_: Iterable[str],
+    chunk_size_: Optional[int] = None,
+    log_transformed_: bool = True
+) -> pd.DataFrame:
+    """
+    Compares the samples of the structures listed in
+    'structure_acronyms_a_' to those listed in 'structure_acronyms_b_',
+    reading the file 'MicroarrayExpression.csv' at the given path.
+    Only the probe ID column and the columns of the compared samples
+    are read, and if 'chunk_size_' is given,
+    they are read and evaluated that many rows at a time.
+    Returns the statistics of 'get_differential_expression',
+    indexed by probe ID.
+    """
+
+    t_group_a: np.ndarray = get_structure_sample_columns(
+        samples_data_, structure_acronyms_a_
+    ) + 1
+    t_group_b: np.ndarray = get_structure_sample_columns(
+        samples_data_, structure_acronyms_b_
+    ) + 1
+    # Columns are read in ascending order, whatever order usecols lists them in
+    t_used_columns: np.ndarray = np.union1d([0], np.union1d(t_group_a, t_group_b))
+    t_group_a_positions: np.ndarray = np.searchsorted(t_used_columns, t_group_a)
+    t_group_b_positions: np.ndarray = np.searchsorted(t_used_columns, t_group_b)
+
+    t_chunks: Iterable[pd.DataFrame] = pd.read_csv(
+        expression_path_, header=None, usecols=t_used_columns.tolist(),
+        chunksize=chunk_size_
+    ) if chunk_size_ else [pd.read_csv(
+        expression_path_, header=None, usecols=t_used_columns.tolist()
+    )]
+    return pd.concat([
+        get_differential_expression(
+            chunk_.to_numpy(dtype=np.float64),
+            t_group_a_positions,
+            t_group_b_positions,
+            chunk_.iloc[:, 0].to_numpy(dtype=np.int64),
+            log_transformed_
+        ) for chunk_ in t_chunks
+    ])
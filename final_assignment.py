@@ -4,14 +4,30 @@ The module converts a .gb file to a format which would be the result of using th
 It defines a GenBankParser class, which handles the conversion of the input file
 The name of the output file will be the name of the input file
 with a .txt extension instead of ".gb" and postfixed with "_features".
+The conversion is run by the function "main" when the module is run as a script,
+so the GenBankParser class can be imported without converting any file.
+The locations of the features are parsed by genbank_locations.py,
+so they can be written in any form of the INSDC location grammar.
+Features with intervals on both strands are extracted interval by interval.
+With the option "--profile=<path>", the stages of the conversion are measured,
+along with the number of specifications and features, and written to that path as JSON,
+each stage also being profiled with cProfile with the option "--cprofile".
 """
 
+from __future__ import annotations
+
 import sys
-from typing import Union, Final, Optional
+from typing import Union, Final, Optional, TYPE_CHECKING
 import re
 import getopt
+from pathlib import Path
 from functools import reduce
-import numpy as np
+
+from pipeline_profiling import profiled_run
+
+if TYPE_CHECKING:
+    import numpy as np
+    from genbank_locations import FeatureLocations
 
 class Feature:
     """
@@ -49,6 +65,9 @@ class GenBankParser:
         }
     )({'a': 't', 't': 'a', 'g': 'c', 'c': 'g'})
 
+    # Matches the type and the location of a specification, which ends before the qualifiers
+    location_pattern: Final[re.Pattern] = re.compile(r'(\S+)\s+([^/]+)')
+
     def __init__(
         self,
         file_path_: str
@@ -58,6 +77,7 @@ class GenBankParser:
         self.definition: str = self.extractDefinition()
         self.specifications: list[dict[str, Union[str, bool, list[list[int]]]]] = []
         self.features: list[Feature] = []
+        self.locations: Optional[FeatureLocations] = None
         self.origin: str = self.extractOrigin()
 
     def extractDefinition(self) -> str:
@@ -79,32 +99,57 @@ class GenBankParser:
             self.source[self.source.index("ORIGIN"):]
         ))
 
-    def getSlices(self, specification_: str) -> list[list[int]]:
+    @staticmethod
+    def getSpan(
+        intervals_: np.ndarray,
+        flags_: np.ndarray
+    ) -> tuple[Union[list[int], list[list[int]]], bool, list[int]]:
+        """
+        Converts the intervals of a parsed location to 1-based, inclusive index ranges,
+            returned as one range if there is only one, or as a list of ranges otherwise,
+            along with whether all of them are on the complement strand,
+            and the strand of each range.
+        Intervals on other records are left out, as they are not in the "ORIGIN" section.
+        Complemented intervals are returned in the order they are in the source sequence,
+            as the whole extracted sequence is complemented and reversed.
+        If the intervals are on both strands, such as for trans-spliced features,
+            they are returned in the order they are read in, each with its own strand.
+        """
+        from genbank_locations import REMOTE, REVERSE_STRAND
+
+        temp_local_intervals: np.ndarray = intervals_[flags_ & REMOTE == 0]
+        temp_reverse: np.ndarray = temp_local_intervals[:, 2] == REVERSE_STRAND
+        temp_is_complement: bool = bool(temp_reverse.size > 0 and temp_reverse.all())
+        if temp_is_complement:
+            temp_local_intervals = temp_local_intervals[::-1]
+        temp_ranges: list[list[int]] = [
+            [start_ + 1, end_] for start_, end_ in temp_local_intervals[:, :2].tolist()
+        ]
+        return (
+            temp_ranges[0] if len(temp_ranges) == 1 else temp_ranges,
+            temp_is_complement,
+            temp_local_intervals[:, 2].tolist()
+        )
+
+    def getSlices(self, specification_: str) -> Union[list[int], list[list[int]]]:
         """
         Extracts the index range from a specification text segment if it has one listed,
-            and all ranges if it features a "join" clause;
-            it only extracts one index if it is not a range.
-        """
-        if "join(" not in specification_:
-            return [*map(int, re.search(
-                r'\d+\.{0,2}\>?\d*',
-                specification_
-            ).group().replace('>', '').split('..'))]
-        else:
-            temp_truncated_spec = specification_[
-                specification_.index("join(") + 5 :
-            ].replace(' ', '').replace('>', '')
-            return [
-                list(map(int, segment_.strip('\n').split('..')))
-                for segment_ in temp_truncated_spec[:temp_truncated_spec.index(')')].split(',')
-            ]
+            and all ranges if it has multiple, such as within a "join" or "order" clause,
+            where the location can be written in any form of the INSDC location grammar.
+        """
+        from genbank_locations import parse_locations
+
+        temp_locations: FeatureLocations = parse_locations([
+            GenBankParser.location_pattern.match(specification_).group(2)
+        ])
+        return GenBankParser.getSpan(temp_locations.get_intervals(0), temp_locations.flags)[0]
     
-    def extractSpecifications(self) -> None:
+    def extractLocations(self) -> None:
         """
-        When the GenBankParser object's "source" attribute already stores a string,
-            this method can be used to fill the object's "specifications" attribute
-            with a list of dictionaries that contain the definition
-            of how to create the Feature objects.
+        Fills the object's "specifications" attribute with the type, first attribute
+            and location text of each specification from the "FEATURES" section,
+            and its "locations" attribute with the intervals of all locations,
+            which are parsed at once.
         """
         temp_specifications: str = self.source[
             re.search(
@@ -126,7 +171,6 @@ class GenBankParser:
             temp_specification: str = temp_specifications[
                 : temp_current_match.span()[0] + 1
             ].strip()
-            temp_is_complement: bool = "complement" in temp_specification
             
             self.specifications.append({
                 'type': re.search(r"\b\S*\b", temp_specification).group(),
@@ -134,18 +178,37 @@ class GenBankParser:
                     r'\/.*=.*"\n',
                     temp_specification
                 ).group().lstrip('/').rstrip('\n'),
-                'span': self.getSlices(
-                    temp_specification if not temp_is_complement else temp_specification.lstrip(
-                        "complement("
-                    ).rstrip(')')
-                ),
-                'is_complement': temp_is_complement
+                'location': GenBankParser.location_pattern.match(
+                    temp_specification
+                ).group(2).strip()
             })
             
             """This way the quotation mark will be escaped and the pattern will
             find the beginning of the next specification section"""
             temp_specifications = temp_specifications[temp_current_match.span()[0] + 1 :]
 
+        from genbank_locations import parse_locations
+
+        # The locations of all specifications are parsed at once
+        self.locations = parse_locations(
+            specification_['location'] for specification_ in self.specifications
+        )
+
+    def extractSpecifications(self) -> None:
+        """
+        When the GenBankParser object's "source" attribute already stores a string,
+            this method can be used to fill the object's "specifications" attribute
+            with a list of dictionaries that contain the definition
+            of how to create the Feature objects.
+        """
+        self.extractLocations()
+        for index_, specification_ in enumerate(self.specifications):
+            specification_['span'], specification_['is_complement'], specification_['strands'] = \
+                GenBankParser.getSpan(
+                self.locations.get_intervals(index_),
+                self.locations.flags[self.locations.get_interval_slice(index_)]
+            )
+
     def sliceOrigin(self, slices_: Union[list[list[int]], list[int]], format_option_: str) -> str:
         """
         It takes the index specifiers of a specification, and extracts those characters
@@ -154,6 +217,8 @@ class GenBankParser:
             it casts the extracted characters mentioned above to uppercase
             and appends the characters before the first indexes of the ranges as lowercase
         """
+        if not slices_: # All ranges are on other records
+            return ''
         if type(slices_[0]) == int: # It is not a nested list, it contains only one span
             temp_sequence: str = self.origin[
                 slices_[0] - 1
@@ -172,6 +237,7 @@ class GenBankParser:
                 )] for range_ in slices_]
             )
             if format_option_ == "uppercased":
+                import numpy as np
                 return ''.join(*np.asarray([*self.origin])[[temp_selected_indexes]])
             else:
                 return ''.join(
@@ -181,18 +247,37 @@ class GenBankParser:
                     )
                 )
     
+    def sliceStrands(self, slices_: list[list[int]], strands_: list[int]) -> str:
+        """
+        Extracts the characters of each index range from the sample sequence,
+            in the order the ranges are given, where the ranges on the complement strand
+            are translated and reversed on their own, and concatenates them.
+        """
+        return ''.join(
+            self.origin[range_[0] - 1 : range_[1]] if strand_ > 0 else ''.join(reversed([
+                GenBankParser.complement_map[character_]
+                for character_ in self.origin[range_[0] - 1 : range_[1]]
+            ])) for range_, strand_ in zip(slices_, strands_)
+        )
+
     def extractFeatures(self, format_option_: str) -> None:
         """
         Creates Feature objects from the specifications the GenBankParser object currently stores.
         If "complement" is True for the given specification,
             the sequence will be translated and reversed.
+        If the specification has ranges on both strands,
+            only the characters of the ranges are extracted, whatever the format option,
+            each range being translated and reversed on its own if it is on the complement strand.
         """
         assert format_option_ in ["uppercased", "separated"], \
             "Option may only be specified as 'separated' or 'uppercase'"
         
         for specification_ in self.specifications:
+            temp_is_mixed_strand: bool = len(set(specification_['strands'])) > 1
             temp_feature: Feature = Feature(
-                self.sliceOrigin(specification_['span'], format_option_),
+                self.sliceStrands(specification_['span'], specification_['strands'])
+                if temp_is_mixed_strand
+                else self.sliceOrigin(specification_['span'], format_option_),
                 (lambda key_value_: {
                     key_value_[0]: key_value_[1].strip('"')
                 })(specification_['attribute'].split('=')),
@@ -209,13 +294,24 @@ class GenBankParser:
 
             self.features.append(temp_feature)
 
+    @staticmethod
+    def getOutputPath(input_path_: str, format_option_: str) -> Path:
+        """
+        Returns the path of the output file, which is in the directory of the input file,
+            named after it with "_features" and the "uppercased" option appended.
+        """
+        temp_input_path: Path = Path(input_path_)
+        return temp_input_path.with_name(
+            temp_input_path.stem + "_features"
+            + ("uppercased" if format_option_ == "uppercased" else '') + '.txt'
+        )
+
     def writeFile(self, input_path_: str, format_option_: str) -> None:
         """
         Creates file according to the specified format
         """
         with open(
-            input_path_.rstrip('.gb') + "_features"
-            + "uppercased" if format_option_ == "uppercased" else '' + '.txt',
+            GenBankParser.getOutputPath(input_path_, format_option_),
             'w',
             newline='',
             encoding='UTF-8'
@@ -235,14 +331,37 @@ class GenBankParser:
                     range(0, len(feature_.sequence), 60)
                 )) + '\n')
 
-external_parameters: tuple[list[tuple[str, str]], list[str]] = getopt.getopt(sys.argv[1:], "")
-input_file_path: Final[str] = external_parameters[1][0]
-format_option: Final[str] = external_parameters[1][1]
+def main(argv_: Optional[list[str]] = None) -> None:
+    """
+    Converts the file passed as the first command line argument,
+        in the format passed as the second one.
+    With the option "--profile=<path>", the stages are measured,
+        and the report is written to the given path as JSON.
+    """
+    external_parameters: tuple[list[tuple[str, str]], list[str]] = getopt.getopt(
+        sys.argv[1:] if argv_ is None else argv_, "", ["profile=", "cprofile"]
+    )
+    input_file_path: Final[str] = external_parameters[1][0]
+    format_option: Final[str] = external_parameters[1][1]
+
+    with profiled_run(
+        "final_assignment",
+        dict(external_parameters[0]).get('--profile'),
+        '--cprofile' in dict(external_parameters[0])
+    ) as profiler_:
+        with profiler_.stage("read_file"):
+            genbank_parser: GenBankParser = GenBankParser(input_file_path)
+            profiler_.count("origin_length", len(genbank_parser.origin))
+        with profiler_.stage("extract_specifications"):
+            genbank_parser.extractSpecifications()
+            profiler_.count("specifications", len(genbank_parser.specifications))
+        with profiler_.stage("extract_features"):
+            genbank_parser.extractFeatures(format_option)
+            profiler_.count("features", len(genbank_parser.features))
+        with profiler_.stage("write_output"):
+            genbank_parser.writeFile(input_file_path, format_option)
 
-genbank_parser: GenBankParser = GenBankParser(input_file_path)
-genbank_parser.extractSpecifications()
-genbank_parser.extractFeatures(format_option)
-genbank_parser.writeFile(input_file_path, format_option)
+    print(f"Created file at location '{GenBankParser.getOutputPath(input_file_path, format_option)}'")
 
-print(f"Created file at location '{input_file_path.rstrip('.gb') + '_features'}"
-      f"{'uppercased' if format_option == 'uppercased' else ''}.txt'")
+if __name__ == "__main__":
+    main()
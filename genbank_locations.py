@@ -0,0 +1,277 @@
+"""
+This module:
+- Parses the locations of GenBank features, following the INSDC
+location grammar, which includes:
+    - Single bases ('467'), ranges ('340..565'),
+    a single base within a range ('102.110'),
+    and sites between two bases ('123^124').
+    - Fuzzy bounds, where a bound may be beyond the given base
+    ('<345..500', '1..>888').
+    - The operators 'join', 'order' and 'complement',
+    which can be nested in any way,
+    e.g. 'complement(join(2691..4571,4918..5163))'
+    or 'join(complement(4918..5163),complement(2691..4571))'.
+    - Ranges on other records, prefixed with their accession
+    ('J00194.1:100..202'), which are flagged as remote.
+- Reads the locations with one compiled regular expression,
+and parses all locations of a record in one batch,
+so the work is linear in the total length of the locations.
+- Stores the intervals of all parsed locations in the FeatureLocations
+class, as contiguous arrays, where the intervals of each location
+are delimited by offsets.
+
+Positions are stored 0-based and half-open, so the interval
+of the location '10..40' is stored as start 9 and end 40,
+and it can be used to slice the sequence directly.
+A site between two bases ('123^124') is an empty interval
+at the position between them.
+The intervals of a location are stored in the order the sequence
+of the feature is read in, so the intervals inside a 'complement'
+are reversed, and their strand is flipped.
+"""
+
+import re
+from typing import Iterable, Optional
+
+import numpy as np
+
+# Strands of the intervals
+FORWARD_STRAND = 1
+REVERSE_STRAND = -1
+
+# Bits of the flags of the intervals
+FUZZY_START = 1 # The interval may start before its start ('<')
+FUZZY_END = 2 # The interval may end after its end ('>')
+WITHIN = 4 # A single base somewhere within the interval ('102.110')
+BETWEEN = 8 # A site between two bases ('123^124')
+REMOTE = 16 # The interval is on another record, given by its accession
+
+# Operators of the locations
+SINGLE = 0 # One interval, without an operator around it
+JOIN = 1
+ORDER = 2
+OPERATOR_CODES: dict[str, int] = {'join': JOIN, 'order': ORDER}
+
+# Separates the locations of a batch, which never occurs within a location
+_LOCATION_SEPARATOR = ';'
+
+_TOKEN_PATTERN: re.Pattern = re.compile(r"""
+    (?P<operator>join|order|complement)\(
+    |(?P<close>\))
+    |(?P<comma>,)
+    |(?P<separator>;)
+    |(?:(?P<accession>[A-Za-z][A-Za-z0-9_]*(?:\.\d+)?):)?
+    (?P<start_fuzzy>[<>])?(?P<start>\d+)
+    (?:(?P<range>\.\.|\.|\^)(?P<end_fuzzy>[<>])?(?P<end>\d+))?
+""", re.VERBOSE)
+
+_WHITESPACE_PATTERN: re.Pattern = re.compile(r'\s+')
+
+class FeatureLocations:
+    """
+    Stores the intervals of parsed locations as contiguous arrays, where
+    - 'starts' and 'ends' are the 0-based, half-open bounds of the intervals.
+    - 'strands' stores FORWARD_STRAND or REVERSE_STRAND for each interval.
+    - 'flags' stores the bits FUZZY_START, FUZZY_END, WITHIN, BETWEEN
+    and REMOTE for each interval.
+    - 'accession_codes' stores the position of each remote interval's
+    accession in 'accessions', and -1 for intervals on the record itself.
+    - 'operators' stores SINGLE, JOIN or ORDER for each location,
+    where a location with only a 'complement' operator is SINGLE.
+    - 'offsets' stores where the intervals of each location start,
+    so the intervals of location i are between offsets[i] and offsets[i + 1].
+    """
+
+    def __init__(
+        self,
+        starts_: np.ndarray,
+        ends_: np.ndarray,
+        strands_: np.ndarray,
+        flags_: np.ndarray,
+        accession_codes_: np.ndarray,
+        accessions_: list[str],
+        operators_: np.ndarray,
+        offsets_: np.ndarray
+    ) -> None:
+        self.starts = starts_
+        self.ends = ends_
+        self.strands = strands_
+        self.flags = flags_
+        self.accession_codes = accession_codes_
+        self.accessions = accessions_
+        self.operators = operators_
+        self.offsets = offsets_
+
+    def __len__(self) -> int:
+        return self.operators.size
+
+    def get_interval_slice(self, location_index_: int) -> slice:
+        """
+        Returns the slice of the interval arrays that holds
+        the intervals of the location at the given position.
+        """
+
+        return slice(
+            int(self.offsets[location_index_]), int(self.offsets[location_index_ + 1])
+        )
+
+    def get_intervals(self, location_index_: int) -> np.ndarray:
+        """
+        Returns the intervals of the location at the given position,
+        as an array with a row for each interval,
+        and columns start, end and strand.
+        """
+
+        t_slice: slice = self.get_interval_slice(location_index_)
+        return np.stack(
+            (self.starts[t_slice], self.ends[t_slice], self.strands[t_slice]), axis=1
+        )
+
+    def get_remote_locations(self) -> np.ndarray:
+        """
+        Returns whether each location has an interval on another record.
+        """
+
+        # Each location has at least one interval, so no slice is empty
+        return np.logical_or.reduceat(
+            self.flags & REMOTE != 0, self.offsets[:-1]
+        ) if len(self) > 0 else np.zeros(0, dtype=bool)
+
+def _get_syntax_error(text_: str, position_: int) -> ValueError:
+    """
+    Returns the error raised for invalid location syntax,
+    pointing to the location the position is in.
+    """
+
+    t_location_start: int = text_.rfind(_LOCATION_SEPARATOR, 0, position_) + 1
+    t_location_end: int = text_.find(_LOCATION_SEPARATOR, position_)
+    t_location: str = text_[
+        t_location_start : t_location_end if t_location_end >= 0 else len(text_)
+    ]
+    return ValueError(
+        f"Invalid location '{t_location}' at character {position_ - t_location_start}"
+    )
+
+def parse_locations(locations_: Iterable[str]) -> FeatureLocations:
+    """
+    Parses each given location text, which may contain whitespace,
+    such as the line breaks of a location spanning multiple lines.
+    All locations are read in one pass, with the locations being
+    separated by a character that cannot occur in them.
+    Raises ValueError if a location does not follow the grammar.
+    """
+
+    t_locations: list[str] = [
+        _WHITESPACE_PATTERN.sub('', location_) for location_ in locations_
+    ]
+    assert not any(_LOCATION_SEPARATOR in location_ for location_ in t_locations), \
+        f"Locations cannot contain '{_LOCATION_SEPARATOR}'"
+    t_text: str = ''.join(
+        location_ + _LOCATION_SEPARATOR for location_ in t_locations
+    )
+
+    t_starts: list[int] = []
+    t_ends: list[int] = []
+    t_strands: list[int] = []
+    t_flags: list[int] = []
+    t_accession_codes: list[int] = []
+    t_accessions: dict[str, int] = {}
+    t_operators: list[int] = []
+    t_offsets: list[int] = [0]
+
+    # Operators that are open, with the number of intervals before them
+    t_open_operators: list[tuple[str, int]] = []
+    t_operator: Optional[str] = None # Outermost operator of the current location
+    t_expects_location: bool = True # Whether a range or operator has to come next
+    t_position: int = 0
+    for match_ in _TOKEN_PATTERN.finditer(t_text):
+        if match_.start() != t_position:
+            raise _get_syntax_error(t_text, t_position)
+        t_position = match_.end()
+        t_kind: Optional[str] = match_.lastgroup if match_.lastgroup in (
+            'operator', 'close', 'comma', 'separator'
+        ) else None
+
+        if t_kind == 'operator':
+            if not t_expects_location:
+                raise _get_syntax_error(t_text, match_.start())
+            # Operators only enclosed by complements are the outermost one
+            if t_operator is None and match_['operator'] != 'complement' and all(
+                operator_ == 'complement' for operator_, _ in t_open_operators
+            ):
+                t_operator = match_['operator']
+            t_open_operators.append((match_['operator'], len(t_starts)))
+        elif t_kind == 'close':
+            if t_expects_location or not t_open_operators:
+                raise _get_syntax_error(t_text, match_.start())
+            t_closed_operator, t_first_interval = t_open_operators.pop()
+            if t_closed_operator == 'complement':
+                # The complement is read backwards on the other strand
+                for list_ in (t_starts, t_ends, t_flags, t_accession_codes):
+                    list_[t_first_interval:] = list_[t_first_interval:][::-1]
+                t_strands[t_first_interval:] = [
+                    -strand_ for strand_ in reversed(t_strands[t_first_interval:])
+                ]
+        elif t_kind == 'comma':
+            if t_expects_location or not t_open_operators \
+                    or t_open_operators[-1][0] == 'complement':
+                raise _get_syntax_error(t_text, match_.start())
+            t_expects_location = True
+        elif t_kind == 'separator':
+            if t_expects_location or t_open_operators:
+                raise _get_syntax_error(t_text, match_.start())
+            t_operators.append(OPERATOR_CODES.get(t_operator, SINGLE))
+            t_offsets.append(len(t_starts))
+            t_operator = None
+            t_expects_location = True
+        else:
+            if not t_expects_location:
+                raise _get_syntax_error(t_text, match_.start())
+            t_expects_location = False
+            t_interval_flags: int = 0
+            t_start: int = int(match_['start'])
+            t_end: int = int(match_['end']) if match_['end'] is not None else t_start
+            if match_['start_fuzzy'] == '<':
+                t_interval_flags |= FUZZY_START
+            # A single base with '>' is fuzzy towards the end
+            if match_['end_fuzzy'] is not None \
+                    or match_['start_fuzzy'] == '>' and match_['end'] is None:
+                t_interval_flags |= FUZZY_END
+            if match_['range'] == '.':
+                t_interval_flags |= WITHIN
+            if match_['range'] == '^':
+                t_interval_flags |= BETWEEN
+            if match_['accession'] is not None:
+                t_interval_flags |= REMOTE
+            if t_end < t_start:
+                raise _get_syntax_error(t_text, match_.start())
+            t_starts.append(t_start if match_['range'] == '^' else t_start - 1)
+            t_ends.append(t_start if match_['range'] == '^' else t_end)
+            t_strands.append(FORWARD_STRAND)
+            t_flags.append(t_interval_flags)
+            t_accession_codes.append(
+                t_accessions.setdefault(match_['accession'], len(t_accessions))
+                if match_['accession'] is not None else -1
+            )
+    if t_position != len(t_text):
+        raise _get_syntax_error(t_text, t_position)
+
+    return FeatureLocations(
+        np.asarray(t_starts, dtype=np.int64),
+        np.asarray(t_ends, dtype=np.int64),
+        np.asarray(t_strands, dtype=np.int8),
+        np.asarray(t_flags, dtype=np.uint8),
+        np.asarray(t_accession_codes, dtype=np.int32),
+        list(t_accessions),
+        np.asarray(t_operators, dtype=np.uint8),
+        np.asarray(t_offsets, dtype=np.int64)
+    )
+
+def parse_location(location_: str) -> np.ndarray:
+    """
+    Parses a single location, and returns its intervals
+    as an array with a row for each interval,
+    and columns start, end and strand.
+    """
+
+    return parse_locations([location_]).get_intervals(0)
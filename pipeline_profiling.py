@@ -0,0 +1,220 @@
+"""
+This module:
+- Defines the PipelineProfiler class, which measures the named stages
+of an analysis run: the time spent in each, how many times it was
+entered, the peak of the memory allocated while it ran, in total
+and above the amount allocated when it started, and counters,
+such as the number of objects created or rows processed.
+- Keeps one active profiler per process, which the analysis functions
+get with 'get_profiler', so they do not have to pass it along.
+When no profiler was activated, a disabled one is returned,
+the stages and counters of which do nothing.
+- Defines the context manager 'profiled_run', which activates
+a profiler for the duration of a script's run,
+and writes its report as JSON to the given path.
+The scripts enable it with the command line option '--profile=<path>',
+and additionally profile each top level stage with cProfile
+when the option '--cprofile' is passed.
+
+Stages can be nested, in which case the name of the nested stage
+is prefixed with the names of the enclosing ones, separated by '/'.
+Entering a stage with the same name again adds to its measurements.
+"""
+
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, Optional, Any
+
+# Number of functions listed per stage, ordered by cumulative time
+PROFILE_FUNCTION_COUNT = 25
+
+class PipelineProfiler:
+    """
+    Collects the measurements of stages and counters,
+    if created with 'enabled_' set to True.
+    Peak memory is traced with tracemalloc, which slows down allocations,
+    so it can be turned off with 'trace_memory_'.
+    If 'cprofile_' is True, each top level stage is run under cProfile,
+    and the functions it spent most time in are added to the report.
+    Only top level stages are profiled, as only one cProfile profiler
+    can be active at a time. Each stage keeps its own cProfile profiler,
+    which accumulates over every time the stage is entered.
+    """
+
+    def __init__(
+        self,
+        enabled_: bool = True,
+        trace_memory_: bool = True,
+        cprofile_: bool = False
+    ) -> None:
+        self.enabled = enabled_
+        self.trace_memory = trace_memory_ and enabled_
+        self.cprofile = cprofile_ and enabled_
+        self.stages: dict[str, dict[str, Any]] = {}
+        self.counters: dict[str, int] = {}
+        # cProfile profilers of the top level stages, by stage name
+        self._profiles: dict[str, cProfile.Profile] = {}
+        # Names of the stages that are currently running, outermost first
+        self._stage_stack: list[str] = []
+        # Peak memory of each running stage, before its nested stages reset it
+        self._peak_stack: list[int] = []
+        self._started_at: float = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name_: str) -> Iterator[None]:
+        """
+        Measures the code run within the 'with' block as a stage.
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        t_name: str = '/'.join(self._stage_stack + [name_])
+        t_stage: dict[str, Any] = self.stages.setdefault(t_name, {
+            'calls': 0, 'seconds': 0.0, 'peak_memory_bytes': 0,
+            'peak_memory_increase_bytes': 0, 'counters': {}
+        })
+        t_profile: Optional[cProfile.Profile] = None
+        if self.cprofile and not self._stage_stack:
+            t_profile = self._profiles.get(t_name)
+            if t_profile is None:
+                t_profile = self._profiles[t_name] = cProfile.Profile()
+
+        if self.trace_memory:
+            if self._peak_stack:
+                self._peak_stack[-1] = max(
+                    self._peak_stack[-1], tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+            t_start_memory: int = tracemalloc.get_traced_memory()[0]
+            self._peak_stack.append(t_start_memory)
+        self._stage_stack.append(name_)
+        if t_profile is not None:
+            t_profile.enable()
+        t_start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            t_stage['seconds'] += time.perf_counter() - t_start
+            t_stage['calls'] += 1
+            if t_profile is not None:
+                t_profile.disable()
+            self._stage_stack.pop()
+            if self.trace_memory:
+                t_peak: int = max(
+                    self._peak_stack.pop(), tracemalloc.get_traced_memory()[1]
+                )
+                t_stage['peak_memory_bytes'] = max(t_stage['peak_memory_bytes'], t_peak)
+                t_stage['peak_memory_increase_bytes'] = max(
+                    t_stage['peak_memory_increase_bytes'], t_peak - t_start_memory
+                )
+                # The enclosing stage's peak is at least that of its nested stage
+                if self._peak_stack:
+                    self._peak_stack[-1] = max(self._peak_stack[-1], t_peak)
+
+    def count(self, name_: str, amount_: int = 1) -> None:
+        """
+        Adds the amount to the counter with the given name,
+        both in total, and for the stage that is currently running.
+        """
+
+        if not self.enabled:
+            return
+        self.counters[name_] = self.counters.get(name_, 0) + amount_
+        if self._stage_stack:
+            t_counters: dict[str, int] = self.stages[
+                '/'.join(self._stage_stack)
+            ]['counters']
+            t_counters[name_] = t_counters.get(name_, 0) + amount_
+
+    def get_report(self) -> dict[str, Any]:
+        """
+        Returns the measurements as a dictionary that can be serialized
+        as JSON, with the stages in the order they were first entered,
+        and the cProfile summary of each profiled stage.
+        """
+
+        return {
+            'total_seconds': time.perf_counter() - self._started_at,
+            'memory_traced': self.trace_memory,
+            'stages': [
+                {
+                    'name': name_,
+                    **stage_,
+                    **({'profile': get_profile_summary(self._profiles[name_])}
+                       if name_ in self._profiles else {})
+                } for name_, stage_ in self.stages.items()
+            ],
+            'counters': self.counters
+        }
+
+def get_profile_summary(profile_: cProfile.Profile) -> list[dict[str, Any]]:
+    """
+    Returns the functions a cProfile profiler spent most time in,
+    ordered by cumulative time, with their number of calls,
+    and their total and cumulative time in seconds.
+    """
+
+    t_statistics: pstats.Stats = pstats.Stats(profile_)
+    return [
+        {
+            'function': f"{file_}:{line_}({function_})",
+            'calls': calls_,
+            'total_seconds': total_time_,
+            'cumulative_seconds': cumulative_time_
+        } for (file_, line_, function_), (_, calls_, total_time_, cumulative_time_, _)
+        in sorted(
+            t_statistics.stats.items(), key=lambda item_: item_[1][3], reverse=True
+        )[:PROFILE_FUNCTION_COUNT]
+    ]
+
+_active_profiler: PipelineProfiler = PipelineProfiler(enabled_=False)
+
+def get_profiler() -> PipelineProfiler:
+    """
+    Returns the active profiler of the process.
+    """
+
+    return _active_profiler
+
+@contextmanager
+def profiled_run(
+    script_name_: str,
+    report_path_: Optional[str],
+    cprofile_: bool = False
+) -> Iterator[PipelineProfiler]:
+    """
+    Activates a profiler for the code run within the 'with' block,
+    if a report path is given, and writes its report there as JSON,
+    along with the name of the script, even if the block raised.
+    If no report path is given, the profiler stays disabled.
+    """
+
+    global _active_profiler
+
+    if report_path_ is None:
+        yield _active_profiler
+        return
+
+    t_previous_profiler: PipelineProfiler = _active_profiler
+    _active_profiler = PipelineProfiler(cprofile_=cprofile_)
+    t_was_tracing: bool = tracemalloc.is_tracing()
+    if not t_was_tracing:
+        tracemalloc.start()
+    try:
+        yield _active_profiler
+    finally:
+        with open(report_path_, 'w', encoding='UTF-8') as report_file_:
+            json.dump(
+                {'script': script_name_, **_active_profiler.get_report()},
+                report_file_,
+                indent=2
+            )
+        if not t_was_tracing:
+            tracemalloc.stop()
+        _active_profiler = t_previous_profiler
@@ -1,14 +1,33 @@
 """
 This module:
 - Contains class definitions of Sample and Probe objects
+- Contains class definition of SampleGroup, which calculates and reports
+the probes shared between and unique to a list of Sample objects
 - Contains class definition of custom exception
 """
 
+from functools import cached_property, reduce
+from itertools import islice
 from types import NoneType
-from typing import Union
+from typing import Union, Final, Iterable, Any, Iterator, TextIO
 
 NEWL = '\n'
 
+def get_incorrect_parameter_types(
+    parameters_: dict[str, Any],
+    expected_types_: Iterable[tuple[type, ...]]
+) -> dict[str, type]:
+    """
+    Returns the names and types of those parameters,
+    the type of which is not among their expected types.
+    """
+
+    return {
+        name_: type(value_)
+        for (name_, value_), types_ in zip(parameters_.items(), expected_types_)
+        if type(value_) not in types_
+    }
+
 class ParametersUnfilled(Exception):
     """
     Exception that is raised when
@@ -21,8 +40,8 @@ class ParametersUnfilled(Exception):
 
     def __init__(self, **incorrect_parameter_types_: type) -> None:
         self.message = NEWL.join(
-            "Parameter" + index_
-            + " has been provided a value of incorrect type" + repr(
+            "Parameter " + index_
+            + " has been provided a value of incorrect type " + repr(
                 incorrect_parameter_types_[index_]
             ) for index_ in incorrect_parameter_types_
         )
@@ -41,11 +60,21 @@ class Probe(object):
     If there are any arguments, the type of which
     did not meet their predescribed type,
     the exception 'ParametersUnfilled' will be raised.
+    Attributes are stored in slots, so instances have no '__dict__'.
+    Many Probe objects can be created without checking each of them
+    through Sample.from_arrays, which checks whole columns instead.
     When called by built-ins 'print' and 'repr',
     prints attributes of Probe instance,
     based on which it can be identified.
     """
 
+    __slots__ = (
+        'probe_id', 'gene_id', 'gene_name',
+        'chromosome', 'expression', 'above_background'
+    )
+    argument_types: Final[tuple[tuple[type, ...], ...]] = (
+        (int,), (int,), (str,), (str, int, NoneType), (float,), (bool,)
+    )
     created_probe_count: int = 0
 
     def __init__(
@@ -57,21 +86,17 @@ class Probe(object):
         expression_: float,
         above_background_: bool
     ) -> None:
-        t_argument_types: list[list[type]] = [
-            [int], [int], [str], [str, int, NoneType], [float], [bool]
-        ]
-        t_incorrect_parameters: filter = filter(
-            lambda param_: param_[1] not in t_argument_types[param_[0]],
-            enumerate(map(
-                type,
-                [probe_id_, gene_id_, gene_name_,
-                 chromosome_, expression_, above_background_]
-            ))
+        t_incorrect_parameters: dict[str, type] = get_incorrect_parameter_types(
+            {
+                'probe_id_': probe_id_, 'gene_id_': gene_id_,
+                'gene_name_': gene_name_, 'chromosome_': chromosome_,
+                'expression_': expression_,
+                'above_background_': above_background_
+            },
+            Probe.argument_types
         )
-        if len(list(t_incorrect_parameters)) > 0:
-            raise ParametersUnfilled(
-                **{param_[0]: param_[1] for param_ in t_incorrect_parameters}
-            )
+        if len(t_incorrect_parameters) > 0:
+            raise ParametersUnfilled(**t_incorrect_parameters)
 
         self.probe_id = probe_id_
         self.gene_id = gene_id_
@@ -81,6 +106,30 @@ class Probe(object):
         self.above_background = above_background_
         Probe.created_probe_count += 1
 
+    @classmethod
+    def from_checked_columns(cls, *columns_: list[Any]) -> list['Probe']:
+        """
+        Creates a Probe object from each position of the given columns,
+        which have to be in the order of the constructor's parameters,
+        and have to contain values of the expected types already.
+        Skips the checks of the constructor, so it should only be called
+        with columns that were checked beforehand.
+        """
+
+        t_probes: list[Probe] = []
+        for probe_id_, gene_id_, gene_name_, chromosome_, expression_, \
+                above_background_ in zip(*columns_):
+            t_probe: Probe = cls.__new__(cls)
+            t_probe.probe_id = probe_id_
+            t_probe.gene_id = gene_id_
+            t_probe.gene_name = gene_name_
+            t_probe.chromosome = chromosome_
+            t_probe.expression = expression_
+            t_probe.above_background = above_background_
+            t_probes.append(t_probe)
+        cls.created_probe_count += len(t_probes)
+        return t_probes
+
     def __str__(self) -> str:
         return f"Probe instance{NEWL}{'-' * 10}{NEWL}" \
                f"Probe id: {self.probe_id}{NEWL}" \
@@ -106,6 +155,8 @@ class Sample(object):
     If there are any arguments, the type of which
     did not meet their predescribed type,
     the exception 'ParametersUnfilled' will be raised.
+    A Sample object can also be created with method 'from_arrays',
+    which checks the type of each probe attribute once per column.
     The class has a method defined to get the list of those Probes,
     that have an expression greater than a target value,
     and are optionally also above background.
@@ -114,6 +165,13 @@ class Sample(object):
     based on which it can be identified.
     """
 
+    __slots__ = (
+        'structure_id', 'structure_acronym', 'structure_name',
+        'polygon_id', 'probes'
+    )
+    argument_types: Final[tuple[tuple[type, ...], ...]] = (
+        (int,), (str,), (str,), (int,), (list,)
+    )
     created_sample_count: int = 0
 
     def __init__(
@@ -124,22 +182,21 @@ class Sample(object):
         polygon_id_: int,
         probes_: list[Probe]
     ) -> None:
-        t_incorrect_parameters: filter = filter(
-            lambda param_: param_[1] != [
-                int, str, str, int, list
-            ][param_[0]] and (True if param_[0] != 4 else not all(
-                isinstance(probe_, Probe) for probe_ in probes_
-            )),
-            enumerate(map(
-                type,
-                [structure_id_, structure_acronym_,
-                 structure_name_, polygon_id_, probes_]
-            ))
+        t_incorrect_parameters: dict[str, type] = get_incorrect_parameter_types(
+            {
+                'structure_id_': structure_id_,
+                'structure_acronym_': structure_acronym_,
+                'structure_name_': structure_name_,
+                'polygon_id_': polygon_id_, 'probes_': probes_
+            },
+            Sample.argument_types
         )
-        if len(list(t_incorrect_parameters)) > 0:
-            raise ParametersUnfilled(
-                **{param_[0]: param_[1] for param_ in t_incorrect_parameters}
-            )
+        if 'probes_' not in t_incorrect_parameters and not all(
+            isinstance(probe_, Probe) for probe_ in probes_
+        ):
+            t_incorrect_parameters['probes_'] = type(probes_)
+        if len(t_incorrect_parameters) > 0:
+            raise ParametersUnfilled(**t_incorrect_parameters)
 
         self.structure_id = structure_id_
         self.structure_acronym = structure_acronym_
@@ -148,6 +205,81 @@ class Sample(object):
         self.probes = probes_
         Sample.created_sample_count += 1
 
+    @classmethod
+    def from_arrays(
+        cls,
+        structure_id_: int,
+        structure_acronym_: str,
+        structure_name_: str,
+        polygon_id_: int,
+        probe_ids_: Any,
+        gene_ids_: Any,
+        gene_names_: Any,
+        chromosomes_: Any,
+        expressions_: Any,
+        above_background_: Any
+    ) -> 'Sample':
+        """
+        Creates a Sample object along with its Probe objects,
+        where the attributes of the probes are passed as aligned arrays,
+        for example as columns of a DataFrame.
+        Instead of checking the types of the arguments of each Probe,
+        it checks the data type of each array once,
+        and raises 'ParametersUnfilled' for those that do not fit.
+        """
+
+        import numpy as np
+
+        t_columns: dict[str, np.ndarray] = {
+            'probe_ids_': np.asarray(probe_ids_),
+            'gene_ids_': np.asarray(gene_ids_),
+            'gene_names_': np.asarray(gene_names_, dtype=object),
+            'chromosomes_': np.asarray(chromosomes_, dtype=object),
+            'expressions_': np.asarray(expressions_),
+            'above_background_': np.asarray(above_background_)
+        }
+        assert len(set(map(len, t_columns.values()))) <= 1, \
+            "Probe attribute arrays have to be of the same length"
+
+        t_incorrect_parameters: dict[str, type] = get_incorrect_parameter_types(
+            {
+                'structure_id_': structure_id_,
+                'structure_acronym_': structure_acronym_,
+                'structure_name_': structure_name_,
+                'polygon_id_': polygon_id_
+            },
+            Sample.argument_types
+        )
+        for name_, kinds_ in zip(
+            ['probe_ids_', 'gene_ids_', 'expressions_', 'above_background_'],
+            ['iu', 'iu', 'f', 'b']
+        ):
+            if t_columns[name_].size > 0 and t_columns[name_].dtype.kind not in kinds_:
+                t_incorrect_parameters[name_] = t_columns[name_].dtype.type
+        for name_, types_ in zip(
+            ['gene_names_', 'chromosomes_'],
+            Probe.argument_types[2:4]
+        ):
+            t_column_types: set[type] = set(map(type, t_columns[name_]))
+            if not t_column_types <= set(types_):
+                t_incorrect_parameters[name_] = next(iter(
+                    t_column_types - set(types_)
+                ))
+        if len(t_incorrect_parameters) > 0:
+            raise ParametersUnfilled(**t_incorrect_parameters)
+
+        t_sample: Sample = cls.__new__(cls)
+        t_sample.structure_id = structure_id_
+        t_sample.structure_acronym = structure_acronym_
+        t_sample.structure_name = structure_name_
+        t_sample.polygon_id = polygon_id_
+        # tolist converts NumPy scalars to the built-in types of Probe attributes
+        t_sample.probes = Probe.from_checked_columns(*(
+            column_.tolist() for column_ in t_columns.values()
+        ))
+        cls.created_sample_count += 1
+        return t_sample
+
     def __str__(self) -> str:
         return f"Sample instance{NEWL}{'-' * 10}{NEWL}" \
                f"Structure id: {self.structure_id}{NEWL}" \
@@ -155,6 +287,11 @@ class Sample(object):
                f"Structure name: {self.structure_name}{NEWL}" \
                f"Polygon id: {self.polygon_id}"
 
+    def __repr__(self) -> str:
+        return f"Sample(structure_id={self.structure_id}, " \
+               f"structure_acronym={self.structure_acronym!r}, " \
+               f"polygon_id={self.polygon_id}, probes={len(self.probes)})"
+
     def get_probes_with_expression_greater_than(
         self,
         cutoff_: int,
@@ -175,3 +312,97 @@ class Sample(object):
             ),
             self.probes
         ))
+
+
+class SampleGroup(object):
+    """
+    Describes a group of Sample objects, for which
+    - 'probe_ids' stores the set of probe IDs of each Sample,
+    in the order of the samples.
+    - 'shared_probe_ids' stores the IDs of probes
+    that were found in all Sample objects' 'probes' attribute.
+    - 'unique_probe_ids' stores for each Sample the IDs of its probes
+    that are not among the shared ones.
+    Each of these is calculated once, when it is first accessed,
+    so a SampleGroup should be created after the probes of its samples
+    were filtered, and a new one should be created if they change.
+    The results can be reported in pages of a bounded number of lines,
+    or written to a file, where each section starts with a line
+    of '#', the section name and the number of IDs,
+    followed by the IDs in ascending order, one per line.
+    When called by built-ins 'print' and 'repr',
+    prints the number of samples and the number of IDs in each result.
+    """
+
+    def __init__(self, samples_: Iterable[Sample]) -> None:
+        self.samples: list[Sample] = list(samples_)
+
+    @cached_property
+    def probe_ids(self) -> list[set[int]]:
+        return [
+            {probe_.probe_id for probe_ in sample_.probes}
+            for sample_ in self.samples
+        ]
+
+    @cached_property
+    def shared_probe_ids(self) -> set[int]:
+        if len(self.probe_ids) == 0:
+            return set()
+        return reduce(
+            lambda accumulator_, next_: accumulator_.intersection(next_),
+            self.probe_ids[1:],
+            set(self.probe_ids[0])
+        )
+
+    @cached_property
+    def unique_probe_ids(self) -> list[set[int]]:
+        return [
+            probe_ids_ - self.shared_probe_ids for probe_ids_ in self.probe_ids
+        ]
+
+    def __str__(self) -> str:
+        return f"SampleGroup instance{NEWL}{'-' * 10}{NEWL}" \
+               f"Sample count: {len(self.samples)}{NEWL}" \
+               f"Shared probe count: {len(self.shared_probe_ids)}{NEWL}" \
+               f"Unique probe counts: " \
+               f"{[len(probe_ids_) for probe_ids_ in self.unique_probe_ids]}"
+
+    def __repr__(self) -> str:
+        return f"SampleGroup(samples={len(self.samples)}, " \
+               f"shared_probes={len(self.shared_probe_ids)})"
+
+    def iter_report_lines(self) -> Iterator[str]:
+        """
+        Yields the lines of the report one by one,
+        starting with the shared probe IDs,
+        followed by the unique probe IDs of each Sample,
+        where the section name identifies the Sample
+        by its structure id, acronym and polygon id.
+        """
+
+        yield f"# shared {len(self.shared_probe_ids)}"
+        yield from map(str, sorted(self.shared_probe_ids))
+        for sample_, unique_probe_ids_ in zip(self.samples, self.unique_probe_ids):
+            yield f"# unique {sample_.structure_id} " \
+                  f"{sample_.structure_acronym} {sample_.polygon_id} " \
+                  f"{len(unique_probe_ids_)}"
+            yield from map(str, sorted(unique_probe_ids_))
+
+    def iter_report_pages(self, page_size_: int) -> Iterator[str]:
+        """
+        Yields the report as pages of at most 'page_size_' lines each,
+        joined by newlines.
+        """
+
+        assert page_size_ > 0, "Page size has to be a positive integer"
+        t_lines: Iterator[str] = self.iter_report_lines()
+        while t_page := list(islice(t_lines, page_size_)):
+            yield NEWL.join(t_page)
+
+    def write_report(self, file_: TextIO) -> None:
+        """
+        Writes the report to an opened text file.
+        """
+
+        for line_ in self.iter_report_lines():
+            file_.write(line_ + NEWL)
@@ -1,39 +1,85 @@
 """
 This module:
-- Unpacks the data from DaMN.xlsx, and retrieves
-    - Unique treatments
-    - Unique inoculation treatments
-    - Rows of individuals that were not killed by scientist handling
-    errors, and the location of these within the source table
+- When run as a script, through function 'main', unpacks the data
+from DaMN.xlsx, located by data_access.py,
+or from all workbooks passed as arguments, which are parsed once
+and then read from a cache (directory of which can be set
+with option '-c'), and retrieves the rows of individuals
+that were not killed by scientist handling errors.
+Importing the module does no work, and does not import pandas.
 - Imports definition of Flea class.
 - Creates objects from all rows in the file DaMN.xlsx,
 where an object's parameters are passed into the constructor
 in the order of the columns from left to right.
+- Calculates the statistics of all metric columns for all treatment
+and inoculation treatment groups at once, with function
+"get_metric_statistics_per_group".
 - Creates a list of dictionaries, where a dictionary is returned
 from calling function "get_average_metrics_per_treatment" with
 a certain column header that was included among the questions.
+- Calculates bootstrap confidence intervals of the same averages,
+from the number of resamples set by option '-b',
+with the random seed set by option '-s',
+in a pool of the number of processes set by option '-j'.
 - Prints attributes of one of the Flea objects as an example,
-besides all dictionaries from the above step
+besides all dictionaries and confidence intervals from the above steps
+- Measures the stages of a run, when the option '--profile=<path>'
+is passed, and writes the measurements to that path as JSON,
+also profiling each stage with cProfile with option '--cprofile'.
 """
 
-import pandas as pd
-import numpy as np
+from __future__ import annotations
+
+import sys
+import getopt
+from typing import Optional, TYPE_CHECKING
 
 from prep_progr_as5_class import Flea
+from pipeline_profiling import profiled_run
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 NEW_LINE = '\n'
 
-flea_data: pd.DataFrame = pd.read_excel(
-    "C:\\Users\\andri\\Documents\\Hanze\\Programming 1\\DaMN.xlsx",
-    sheet_name="Sheet1"
-)
-treatments: set[str] = set(flea_data['Treatment'])
-inoculation_treatments: set[str] = set(flea_data['In_treatment'])
-successful_specimen_indices = flea_data['H_errors'] != 1
-successful_specimen = flea_data[successful_specimen_indices]
+# Output descriptions of the metric columns that averages are calculated for
+METRIC_DESCRIPTIONS: dict[str, str] = {
+    'Age_death': "mortality (in days lived)",
+    'Total_juv': "offspring count",
+    'Inf_mets': "infection_rate",
+    'Spore_yield': "spore yield"
+}
+
+def get_metric_statistics_per_group(
+    data_: pd.DataFrame,
+    metric_columns_: list[str],
+    group_columns_: list[str],
+    median_: bool = False
+) -> dict[str, pd.DataFrame]:
+    """
+    For each column to group by, calculates the mean, count
+    and variance, and optionally the median, of all metric columns
+    for all groups at once, where each grouping is a single pass
+    over the rows of the table.
+    Returns a dictionary, where keys are the columns grouped by,
+    and values are DataFrames with one row per group,
+    and a column for each pair of metric column and statistic.
+    Missing values are left out of the statistics of their column.
+    """
+
+    t_statistics: list[str] = ['mean', 'count', 'var'] + (
+        ['median'] if median_ else []
+    )
+    return {
+        group_column_: data_.groupby(group_column_)[metric_columns_].agg(
+            t_statistics
+        ) for group_column_ in group_columns_
+    }
 
 def get_average_metric_per_treatment(
-    flea_objects_: list[Flea], metric_column_: str, inoculation_: bool
+    metric_statistics_: dict[str, pd.DataFrame],
+    metric_column_: str,
+    inoculation_: bool
 ) -> dict[str, float]:
     """
     Can be applied to those four columns, for which average values have
@@ -41,8 +87,7 @@ def get_average_metric_per_treatment(
     For grouping based on inoculation treatment, only the column
     can to be used that stores whether an individual got infected.
     Maps the possible inputs (headers of above mentioned 4 columns)
-    to the respective output descriptions, and names of Flea object
-    attributes.
+    to the respective output descriptions.
     Returns a dictionary that will have
     - elements for all groupings (number of distinct treatments)
     - keys describing
@@ -50,71 +95,113 @@ def get_average_metric_per_treatment(
         - Which column the averages were calculated from
     - a floating point value as the average of the column that was
     chosen for the calculation
-    Only those individuals are taken into account that did not die
-    due to scientist handling errors.
+    The averages are taken from the statistics that were calculated
+    by "get_metric_statistics_per_group" from the rows of those
+    individuals that did not die due to scientist handling errors.
     """
 
-    assert metric_column_ in flea_data.columns.values[[4, 5, 7, 8]], \
+    assert metric_column_ in METRIC_DESCRIPTIONS, \
         f"The function only handles data from columns" \
-        f" {flea_data.columns.values[[4, 5, 7, 8]]}"
+        f" {list(METRIC_DESCRIPTIONS)}"
     if inoculation_:
         assert metric_column_ == "Inf_mets", \
             "Only column 'Inf_mets' should be calculated" \
             "when grouping based on inoculation treatment"
 
-    t_metric_description_map_: dict[str, str] = dict((
-        column_, description_
-    ) for column_, description_ in zip(
-        flea_data.columns.values[[4, 5, 7, 8]],
-        ["mortality (in days lived)", "offspring count",
-         "infection_rate", "spore yield"]
-    ))
-    t_metric_attribute_map_: dict[str, str] = dict((
-        column_, attribute_
-    ) for column_, attribute_ in zip(
-        flea_data.columns.values[[4, 5, 7, 8]],
-        ["life_duration", "offspring_count",
-         "was_infected", "spore_yield"]
-
-    ))
-
     return dict((
-        f"Average {t_metric_description_map_[metric_column_]} for"
+        f"Average {METRIC_DESCRIPTIONS[metric_column_]} for"
         f"{' inoculation' if inoculation_ else ''} treatment {key_}",
-        sum(
-            getattr(
-                flea_, t_metric_attribute_map_[metric_column_]
-            ) for flea_ in filter(
-                lambda object_: getattr(
-                    object_,
-                    'treatment' if not inoculation_ else 'inoculation_treatment'
-                ) == key_ and not object_.was_handling_error_victim
-                , flea_objects_
+        float(average_)
+    ) for key_, average_ in metric_statistics_[
+        'Treatment' if not inoculation_ else 'In_treatment'
+    ][(metric_column_, 'mean')].items())
+
+def main(argv_: Optional[list[str]] = None) -> None:
+    """
+    Gathers the values of the command line arguments, loads the data,
+    and prints an example individual, the averages
+    and their confidence intervals.
+    With option '--profile=<path>', the stages are measured,
+    and the report is written to the given path as JSON.
+    """
+
+    import numpy as np
+
+    from data_access import load_flea_data
+    from bootstrap_intervals import get_bootstrap_intervals_per_group
+
+    # Workbooks may be passed as arguments, with '-j' for loading them in parallel
+    external_parameters = getopt.getopt(
+        sys.argv[1:] if argv_ is None else argv_, "j:c:b:s:", ["profile=", "cprofile"]
+    )
+    worker_count: int = int(dict(external_parameters[0]).get('-j', 1))
+    resample_count: int = int(dict(external_parameters[0]).get('-b', 10_000))
+    random_seed: Optional[int] = int(dict(external_parameters[0])['-s']) \
+        if '-s' in dict(external_parameters[0]) else None
+
+    with profiled_run(
+        "prep_progr_as5",
+        dict(external_parameters[0]).get('--profile'),
+        '--cprofile' in dict(external_parameters[0])
+    ) as profiler_:
+        with profiler_.stage("load_data"):
+            flea_data: pd.DataFrame = load_flea_data(
+                external_parameters[1],
+                "Sheet1",
+                dict(external_parameters[0]).get('-c'),
+                worker_count
             )
-        ) / successful_specimen[successful_specimen[
-            'Treatment' if not inoculation_ else 'In_treatment'
-        ] == key_].shape[0]
-    ) for key_ in (
-        treatments if not inoculation_ else inoculation_treatments
-    ))
-
-
-flea_objects: list[Flea] = [Flea(*map(
-    lambda cell_: bool(int(cell_[1])) if cell_[0] in [7,10] else cell_[1],
-    zip(range(11), flea_data.iloc[row_, :])
-)) for row_ in range(flea_data.shape[0])]
-
-average_metrics_per_treatment: list[dict[str, float]] = [
-    get_average_metric_per_treatment(
-        np.asarray(flea_objects)[[successful_specimen_indices]].tolist(),
-        column_,
-        column_ == 'Inf_mets'
-    ) for column_ in [
-        'Age_death', 'Total_juv', 'Spore_yield', 'Inf_mets'
-    ]
-]
-
-print(f"Example individual:{NEW_LINE * 2}{flea_objects[5]}{NEW_LINE}")
-print("Average metrics grouped by treatments:\n")
-for dict_ in average_metrics_per_treatment:
-    print(dict_)
+            successful_specimen: pd.DataFrame = flea_data[flea_data['H_errors'] != 1]
+            profiler_.count("rows", flea_data.shape[0])
+
+        with profiler_.stage("construct_fleas"):
+            flea_objects: list[Flea] = Flea.from_dataframe(flea_data)
+            profiler_.count("fleas_created", len(flea_objects))
+
+        with profiler_.stage("group_statistics"):
+            metric_statistics_per_group: dict[str, pd.DataFrame] = \
+                get_metric_statistics_per_group(
+                    successful_specimen,
+                    ['Age_death', 'Total_juv', 'Spore_yield', 'Inf_mets'],
+                    ['Treatment', 'In_treatment']
+                )
+            average_metrics_per_treatment: list[dict[str, float]] = [
+                get_average_metric_per_treatment(
+                    metric_statistics_per_group,
+                    column_,
+                    column_ == 'Inf_mets'
+                ) for column_ in [
+                    'Age_death', 'Total_juv', 'Spore_yield', 'Inf_mets'
+                ]
+            ]
+
+        with profiler_.stage("bootstrap"):
+            # Each grouping gets its own seed, so their resamples are independent
+            bootstrap_intervals_per_group: list[pd.DataFrame] = [
+                get_bootstrap_intervals_per_group(
+                    successful_specimen, metric_columns_, group_column_,
+                    resample_count, 0.95, grouping_seed_, worker_count
+                ) for (metric_columns_, group_column_), grouping_seed_ in zip(
+                    [
+                        (['Age_death', 'Total_juv', 'Spore_yield'], 'Treatment'),
+                        (['Inf_mets'], 'In_treatment')
+                    ],
+                    np.random.SeedSequence(random_seed).spawn(2)
+                )
+            ]
+            profiler_.count("resamples_drawn", resample_count * sum(
+                intervals_.size // 3 for intervals_ in bootstrap_intervals_per_group
+            ))
+
+        with profiler_.stage("write_output"):
+            print(f"Example individual:{NEW_LINE * 2}{flea_objects[5]}{NEW_LINE}")
+            print("Average metrics grouped by treatments:\n")
+            for dict_ in average_metrics_per_treatment:
+                print(dict_)
+            print(f"{NEW_LINE}95% bootstrap confidence intervals of averages "
+                  f"from {resample_count} resamples:{NEW_LINE}")
+            for intervals_ in bootstrap_intervals_per_group:
+                print(intervals_.to_string(), end=NEW_LINE * 2)
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 Houses definition of the Flea class.
 """
 
-from typing import Union
+from typing import Union, Final, Any
 
 NEW_LINE = '\n'
 
@@ -10,10 +10,24 @@ class Flea:
     """
     Defines an individual from the experiment, where one
     can be instantiated by spreading all values from a certain row.
+    Attributes are stored in slots, named in the order of the columns,
+    so instances have no '__dict__'.
+    Objects for all rows of a table can be created at once
+    with method 'from_dataframe'.
     When an object created from this class has "repr" or "print"
     called upon, it lists the names and values of its attributes.
     """
 
+    attribute_names: Final[tuple[str, ...]] = (
+        'specimen_id', 'treatment', 'nanoplastic_treatment',
+        'inoculation_treatment', 'life_duration', 'offspring_count',
+        'birth_count', 'was_infected', 'spore_yield', 'first_birth_at',
+        'was_handling_error_victim'
+    )
+    # Positions of the columns that store 0 or 1 for a boolean attribute
+    boolean_columns: Final[tuple[int, ...]] = (7, 10)
+    __slots__ = attribute_names
+
     def __init__(self, *parameters_) -> None:
         assert len(parameters_) == 11, "Incorrect amount of columns passed"
 
@@ -29,15 +43,30 @@ class Flea:
         self.first_birth_at: int = parameters_[9]
         self.was_handling_error_victim: bool = parameters_[10]
 
+    @classmethod
+    def from_dataframe(cls, data_: Any) -> list['Flea']:
+        """
+        Creates a Flea object from each row of a DataFrame,
+        the columns of which are in the order of the attributes.
+        Each column is converted once as a whole,
+        where the columns of boolean attributes are cast from 0 or 1,
+        so no Series is created per row.
+        """
+
+        assert data_.shape[1] == 11, "Incorrect amount of columns passed"
+        t_columns: list[list[Any]] = [
+            data_.iloc[:, index_].to_numpy().astype(int).astype(bool).tolist()
+            if index_ in cls.boolean_columns
+            else data_.iloc[:, index_].tolist()
+            for index_ in range(11)
+        ]
+        return [cls(*values_) for values_ in zip(*t_columns)]
+
     def __str__(self) -> str:
-        t_instance_attributes: list[str] = list(filter(
-            lambda attribute_: '__' not in attribute_,
-            dir(self)
-        ))
         t_attribute_value_map: dict[str, Union[int, str, bool]] = dict((
             attribute_, getattr(self, attribute_)
-        ) for attribute_ in t_instance_attributes[1:])
+        ) for attribute_ in Flea.attribute_names[1:])
 
         return f"Attributes of individual with ID " \
-               f"{getattr(self, t_instance_attributes[0])}:{NEW_LINE}"\
+               f"{self.specimen_id}:{NEW_LINE}"\
                f"{t_attribute_value_map}"
@@ -1,116 +1,125 @@
 # Runs on Python 3.10
+# Each task is a function, which is called by main() when run as a script, so importing the module does no work
 
-import pandas as pd
-from typing import Union
+from __future__ import annotations
+
+from typing import Union, TYPE_CHECKING
 from functools import reduce
 
+if TYPE_CHECKING:
+    from probe_tools import ProbeCatalog
+
 new_line = "\n"
+expression_chunk_size: int = 5000 # Rows of MicroarrayExpression.csv held in memory at once
 
 # TASK 1 ###
 
-# Groups probe IDs by gene ID
-probes_data: pd.DataFrame = pd.read_csv("C:\\Users\\andri\\Documents\\Hollandia\\Programming\\Probes.csv")
-gene_ids: set[int] = set(probes_data.loc[:, "gene_id"])
-probes_grouped_by_gene: dict[int, list[int]] = dict((
-    key_, list(probes_data[probes_data["gene_id"] == key_]["probe_id"].values)
-) for key_ in gene_ids)
-del probes_data
-
-# Retrieves average expression for each probe and casts that into a dictionary where keys are the probe IDs
-probes_expression_samples: pd.DataFrame = pd.read_csv(
-    "C:\\Users\\andri\\Documents\\Hollandia\\Programming\\MicroarrayExpression.csv",
-    header= None
-)
-probes_expression_averages: Union[pd.DataFrame, dict[int, float]] = pd.DataFrame(
-    {"probe_id": probes_expression_samples.iloc[:, 0]}
-).join(
-    pd.DataFrame({"avg": probes_expression_samples.iloc[:, 1:].mean(axis=1)})
-)
-probes_expression_averages = dict(
-    (key_, val_) for key_, val_ in zip(probes_expression_averages.iloc[:, 0], probes_expression_averages.iloc[:, 1])
-)
-
-# Retrieves and outputs the ID of probe with the highest expression average for each gene ID
-temp__highest_average_value: float
-genes_highest_average_expression: dict[int, dict[str, Union[float, list[int]]]] = dict((
-    key_, {
-        "highest_avg": (temp__highest_average_value := max(
-            map(probes_expression_averages.get, probes_grouped_by_gene[key_])
-        )),
-        "respective_probe_id(s)": [x for x in probes_expression_averages if probes_expression_averages[x] == temp__highest_average_value]
-    } # Respective id(s) is of type list, because there may be an edge case where multiple equivalent values exist that are the highest
-) for key_ in probes_grouped_by_gene)
-print(f"ID of probe with the highest average expression for each gene{new_line}{genes_highest_average_expression}")
+def get_genes_highest_average_expression(
+    probe_catalog_: ProbeCatalog,
+    chunk_size_: int = expression_chunk_size
+) -> dict[int, dict[str, Union[float, list[int]]]]:
+    """
+    Retrieves average expression for each probe, indexed by the probe IDs.
+    Retrieves the ID of probe with the highest expression average for each gene ID.
+    """
+    from data_access import get_data_path
+    from probe_tools import get_top_probes_per_gene, get_probe_expression_averages
+
+    t_probes_expression_averages = get_probe_expression_averages(
+        get_data_path("expression"), chunk_size_
+    )
+    return get_top_probes_per_gene(
+        t_probes_expression_averages.index,
+        probe_catalog_.get_gene_ids(t_probes_expression_averages.index),
+        t_probes_expression_averages.values
+    ) # Respective id(s) is of type list, because there may be an edge case where multiple equivalent values exist that are the highest
 
 # TASK 2 ###
 
-"""
-Retrieves those expression value columns from MicroarrayExpression.csv, 
-    where the column index matches the row index of the rows from Probes.csv, 
-    where the column "structure_acronym" has a value of "LHM" or "PHA", respectively.
-Retrieves the index of all rows from the above selected expression value columns,
-    where the expression value is higher than 15,
-    for each sample column,
-    for each region.
-Deallocates variable housing MicroarrayExpression.csv.
-"""
-samples: pd.DataFrame = pd.read_csv("C:\\Users\\andri\\Documents\\Hollandia\\Programming\\SampleAnnot.csv")
-LHM_sample_columns: pd.DataFrame = pd.DataFrame({
-    f"expression_values_column_{index_}": probes_expression_samples.iloc[:, index_] for index_ in samples[samples["structure_acronym"] == "LHM"].index
-})
-LHM_sample_filtered_row_numbers: dict[str, list[int]] = {
-    column_header_: list(LHM_sample_columns[LHM_sample_columns[column_header_] > 15].index) for column_header_ in LHM_sample_columns.columns
-}
-PHA_sample_columns: pd.DataFrame = pd.DataFrame({
-    f"expression_values_column_{index_}": probes_expression_samples.iloc[:, index_] for index_ in samples[samples["structure_acronym"] == "PHA"].index
-})
-PHA_sample_filtered_row_numbers: dict[str, list[int]] = {
-    column_header_: list(PHA_sample_columns[PHA_sample_columns[column_header_] > 15].index) for column_header_ in PHA_sample_columns.columns
-}
-del probes_expression_samples
-
-"""
-Retrieves the IDs of those probes that are present in all samples from both brain regions.
-Retrieves probe IDs for each sample that do not exist in other samples of the same group.
-"""
-probes_shared_across_LHM_samples: set[int] = reduce(
-    lambda accumulator_, next_: set(accumulator_).intersection(set(next_)),
-    map(lambda items_: items_[1], LHM_sample_filtered_row_numbers.items()) # .items() returns a sequence of tuples, where in each tuple key is at index 0, values at index 1.
-)
-probes_shared_across_PHA_samples: set[int] = reduce(
-    lambda accumulator_, next_: set(accumulator_).intersection(set(next_)),
-    map(lambda items_: items_[1], PHA_sample_filtered_row_numbers.items())
-)
-probes_unique_between_LHM_samples: set[int] = reduce(
-    lambda accumulator_, next_: set(accumulator_) ^ set(next_), # "^" when applied to sets, returns the items that are not found in both sets
-    map(lambda items_: items_[1], LHM_sample_filtered_row_numbers.items())
-)
-probes_unique_between_PHA_samples: set[int] = reduce(
-    lambda accumulator_, next_: set(accumulator_) ^ set(next_),
-    map(lambda items_: items_[1], PHA_sample_filtered_row_numbers.items())
-)
-
-"""
-Retrieves the union of the IDs of probes present across the samples taken from brain regions LHM or PHA.
-Retrieves and outputs the IDs of those probes that are present in both brain regions.
-Retrieves and outputs the IDs of those probes that are unique for each brain region.
-"""
-all_probes_across_LHM_samples: set[int] = reduce(
-    lambda accumulator_, next_: set(accumulator_).union(set(next_)),
-    map(lambda items_: items_[1], LHM_sample_filtered_row_numbers.items())
-)
-all_probes_across_PHA_samples: set[int] = reduce(
-    lambda accumulator_, next_: set(accumulator_).union(set(next_)),
-    map(lambda items_: items_[1], PHA_sample_filtered_row_numbers.items())
-)
-probes_shared_between_regions = all_probes_across_LHM_samples.intersection(all_probes_across_PHA_samples)
-probes_unique_between_regions: dict[str, set[int]] = dict((
-    key_, vals_ ^ probes_shared_between_regions
-) for key_, vals_ in zip(
-    ["LHM_unique", "PHA_unique"],
-    [all_probes_across_LHM_samples, all_probes_across_PHA_samples]
-))
-print(
-    f"IDs of probes shared between LHM and PHA regions:{new_line}{probes_shared_between_regions}",
-    f"IDs of probes unique for LHM and PHA regions:{new_line}{probes_unique_between_regions}"
-)
\ No newline at end of file
+def get_region_sample_filtered_row_numbers(
+    region_acronyms_: list[str],
+    chunk_size_: int = expression_chunk_size
+) -> dict[str, dict[str, list[int]]]:
+    """
+    Retrieves those expression value columns from MicroarrayExpression.csv,
+        where the column belongs to the rows from SampleAnnot.csv,
+        where the column "structure_acronym" has a value of one of the region acronyms, respectively.
+    Retrieves the index of all rows from the above selected expression value columns,
+        where the expression value is higher than 15,
+        for each sample column,
+        for each region.
+    Only the selected columns are read, in chunks of rows.
+    """
+    from data_access import get_data_path, load_sample_annotations
+    from probe_tools import get_region_sample_hits
+
+    return get_region_sample_hits(
+        get_data_path("expression"), load_sample_annotations(), region_acronyms_, 15, chunk_size_
+    )
+
+def get_region_probe_sets(sample_filtered_row_numbers_: dict[str, list[int]]) -> dict[str, set[int]]:
+    """
+    Retrieves the IDs of those probes that are present in all samples from a brain region.
+    Retrieves probe IDs for each sample that do not exist in other samples of the same group.
+    Retrieves the union of the IDs of probes present across the samples taken from a brain region.
+    A region without samples, such as one whose acronym is not in SampleAnnot.csv, has empty sets.
+    """
+    if not sample_filtered_row_numbers_:
+        return {
+            "shared_across_samples": set(),
+            "unique_between_samples": set(),
+            "all_across_samples": set()
+        }
+    return {
+        "shared_across_samples": reduce(
+            lambda accumulator_, next_: set(accumulator_).intersection(set(next_)),
+            map(lambda items_: items_[1], sample_filtered_row_numbers_.items()) # .items() returns a sequence of tuples, where in each tuple key is at index 0, values at index 1.
+        ),
+        "unique_between_samples": reduce(
+            lambda accumulator_, next_: set(accumulator_) ^ set(next_), # "^" when applied to sets, returns the items that are not found in both sets
+            map(lambda items_: items_[1], sample_filtered_row_numbers_.items())
+        ),
+        "all_across_samples": reduce(
+            lambda accumulator_, next_: set(accumulator_).union(set(next_)),
+            map(lambda items_: items_[1], sample_filtered_row_numbers_.items())
+        )
+    }
+
+def get_probes_between_regions(
+    region_probe_sets_: dict[str, dict[str, set[int]]]
+) -> tuple[set[int], dict[str, set[int]]]:
+    """
+    Retrieves the IDs of those probes that are present in all brain regions.
+    Retrieves the IDs of those probes that are unique for each brain region.
+    """
+    t_probes_shared_between_regions: set[int] = reduce(
+        lambda accumulator_, next_: accumulator_.intersection(next_),
+        [probe_sets_["all_across_samples"] for probe_sets_ in region_probe_sets_.values()]
+    )
+    return t_probes_shared_between_regions, dict((
+        f"{key_}_unique", vals_["all_across_samples"] ^ t_probes_shared_between_regions
+    ) for key_, vals_ in region_probe_sets_.items())
+
+def main() -> None:
+    """
+    Outputs the results of both tasks.
+    """
+    from data_access import load_probes
+    from probe_tools import ProbeCatalog
+
+    genes_highest_average_expression: dict[int, dict[str, Union[float, list[int]]]] = \
+        get_genes_highest_average_expression(ProbeCatalog(load_probes()))
+    print(f"ID of probe with the highest average expression for each gene{new_line}{genes_highest_average_expression}")
+
+    region_probe_sets: dict[str, dict[str, set[int]]] = {
+        region_: get_region_probe_sets(sample_filtered_row_numbers_)
+        for region_, sample_filtered_row_numbers_ in get_region_sample_filtered_row_numbers(["LHM", "PHA"]).items()
+    }
+    probes_shared_between_regions, probes_unique_between_regions = get_probes_between_regions(region_probe_sets)
+    print(
+        f"IDs of probes shared between LHM and PHA regions:{new_line}{probes_shared_between_regions}",
+        f"IDs of probes unique for LHM and PHA regions:{new_line}{probes_unique_between_regions}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,32 @@
+"""
+Calculates the selected timeseries metrics over a sliding window
+for each column of a CSV file, and writes them to a new CSV file
+next to the input file.
+Work is only done when calling the functions, or function 'main'
+when run as a script, which also imports pandas only when needed.
+With option '--profile=<path>', reading the input, calculating
+the metrics and writing the output are measured as separate stages,
+along with the number of windows and metric calculations,
+and the measurements are written to that path as JSON, also profiling each stage with cProfile with option '--cprofile'.
+"""
+
+from __future__ import annotations
+
 import sys
 import getopt
-from typing import Generator, Union, Any, Callable
+from typing import Generator, Union, Any, Callable, Optional, TYPE_CHECKING
 import csv
 import functools as fn
-import pandas
+from pathlib import Path
+
+if TYPE_CHECKING:
+    import pandas
 
+from pipeline_profiling import PipelineProfiler, get_profiler, profiled_run
 from calculate_timeseries_metrics import \
     calculate_standard_deviation, calculate_historical_volatility,\
     calculate_moving_average, calculate_moving_average_crossover_divergence
 
-BACKSLASH = '\\'
-external_parameters = getopt.getopt(sys.argv[1:], "")
-
-input_file_path: str = external_parameters[1][0]
-separator: str = external_parameters[1][1]
-no_header: bool = bool(int(external_parameters[1][2]))
-short_moving_average_length: int = int(external_parameters[1][3])
-calculation_sequence_length: int = int(external_parameters[1][4])
-is_moving_average_exponential: bool = bool(int(external_parameters[1][5]))
-output_file_name: str = external_parameters[1][6]
-# Values can be passed in any order: vol, ma, macd, std
-calculation_references: list[str] = external_parameters[1][7:]
-
-assert all(
-    reference_ in [
-        'vol', 'ma', 'macd', 'std'
-    ] for reference_ in calculation_references
-), "Only calculations ['vol', 'ma', 'macd', 'std'] can be specified."
-
-if 'macd' in calculation_references:
-    assert short_moving_average_length < calculation_sequence_length,\
-        "The fourth argument should refer to a calculation sequence " \
-        "length that is longer than that of the third argument."
-
 def flatten_list(list_of_lists: list[list[Any]]) -> list[Any]:
     """Arranges all items of lists from within a list
     to be placed in one list"""
@@ -43,75 +37,154 @@ def flatten_list(list_of_lists: list[list[Any]]) -> list[Any]:
 
 def generate_dataframe_rows(
     *timeseries_columns_: pandas.Series(float),
+    calculation_sequence_length_: int,
     **metrics_: Union[Callable[..., float], fn.partial]
 ) -> Generator[list[Union[float, None]], None, None]:
     """Generates output file rows one by one, using the functions
     that were selected for calculating timeseries metrics.
     Using a generator is useful,
     because the method csv.writer.writerow
-    inserts those one by one anyways"""
+    inserts those one by one anyways.
+    The metrics of each row are measured as a stage,
+    which ends before the row is yielded to be written"""
 
+    t_profiler: PipelineProfiler = get_profiler()
     for window_start_, window_end_ in enumerate(range(
-        calculation_sequence_length - 1,
+        calculation_sequence_length_ - 1,
         max(map(len, timeseries_columns_))
     )):
-        yield flatten_list(
-            [[timeseries_columns_[column_group_].iloc[window_end_]] + [
-                 metrics_[argument_key_](
-                    timeseries_columns_[column_group_].iloc[window_start_: window_end_]
-                 ) for argument_key_ in metrics_
-            ] for column_group_ in range(len(timeseries_columns_))]
+        with t_profiler.stage("calculate_metrics"):
+            t_profiler.count("windows")
+            t_profiler.count("metric_calls", len(timeseries_columns_) * len(metrics_))
+            t_row: list[Union[float, None]] = flatten_list(
+                [[timeseries_columns_[column_group_].iloc[window_end_]] + [
+                     metrics_[argument_key_](
+                        timeseries_columns_[column_group_].iloc[window_start_: window_end_]
+                     ) for argument_key_ in metrics_
+                ] for column_group_ in range(len(timeseries_columns_))]
+            )
+        yield t_row
+
+def get_calculation_functions(
+    short_moving_average_length_: int,
+    is_moving_average_exponential_: bool
+) -> dict[str, Union[Callable[..., float], fn.partial]]:
+    """Maps functions to their abbreviations"""
+    return {
+        'vol': calculate_historical_volatility,
+        'ma': calculate_moving_average if not is_moving_average_exponential_
+        else fn.partial(calculate_moving_average, exponential_=True),
+        'macd': fn.partial(
+            calculate_moving_average_crossover_divergence,
+            short_length_=short_moving_average_length_
+        ),
+        'std': calculate_standard_deviation
+    }
+
+def write_timeseries_metrics(
+    input_file_path_: str,
+    separator_: str,
+    no_header_: bool,
+    short_moving_average_length_: int,
+    calculation_sequence_length_: int,
+    is_moving_average_exponential_: bool,
+    output_file_name_: str,
+    calculation_references_: list[str]
+) -> Path:
+    """Reads the input file, and writes the selected metrics
+    of each of its columns to the output file,
+    which is placed in the directory of the input file.
+    Returns the path of the output file."""
+
+    import pandas
+
+    assert all(
+        reference_ in [
+            'vol', 'ma', 'macd', 'std'
+        ] for reference_ in calculation_references_
+    ), "Only calculations ['vol', 'ma', 'macd', 'std'] can be specified."
+
+    if 'macd' in calculation_references_:
+        assert short_moving_average_length_ < calculation_sequence_length_,\
+            "The fourth argument should refer to a calculation sequence " \
+            "length that is longer than that of the third argument."
+
+    map_calculation_functions: dict[
+        str, Union[Callable[..., float], fn.partial]
+    ] = get_calculation_functions(
+        short_moving_average_length_, is_moving_average_exponential_
+    )
+
+    t_profiler: PipelineProfiler = get_profiler()
+    with t_profiler.stage("load_input"):
+        input_file: pandas.DataFrame = pandas.read_csv(
+            input_file_path_, sep=separator_, header=(None if no_header_ else 0)
         )
+        t_profiler.count("input_rows", input_file.shape[0])
+    yieldRow: Generator[list[float], None, None] = generate_dataframe_rows(
+        *[input_file.iloc[:, column_index_] for column_index_ in range(input_file.shape[1])],
+        calculation_sequence_length_=calculation_sequence_length_,
+        **dict((key_, map_calculation_functions[key_]) for key_ in calculation_references_)
+    )
+
+    output_file_path: Path = Path(input_file_path_).with_name(f"{output_file_name_}.csv")
+    with open(output_file_path, 'w', newline='', encoding='UTF8') as f:
+        writer = csv.writer(f)
+
+        with t_profiler.stage("write_output"):
+            # Creates headers
+            writer.writerow(flatten_list(
+                [[
+                    t_current_column := f"Column{column_index_}" if no_header_
+                    else input_file.columns.values[column_index_],
+                    *[f"{t_current_column}_{metric_}" for metric_ in calculation_references_]
+                ] for column_index_ in range(input_file.shape[1])]
+            ))
+
+            """Inserts rows that will not have metrics associated
+            due to residing at a row index less than the calculation length"""
+            for row_index_ in range(calculation_sequence_length_ - 1):
+                writer.writerow(flatten_list(
+                    [[
+                        float(input_file.iat[row_index_, column_index_]),
+                        *[None for _ in calculation_references_]
+                    ] for column_index_ in range(input_file.shape[1])]
+                ))
+
+        for timestep_ in range(input_file.shape[0] - calculation_sequence_length_ + 1):
+            # The metrics are measured while generating the row, outside this stage
+            t_row: list[Union[float, None]] = next(yieldRow)
+            with t_profiler.stage("write_output"):
+                writer.writerow(t_row)
+
+    return output_file_path
+
+def main(argv_: Optional[list[str]] = None) -> None:
+    """Gathers the values of the command line arguments,
+    and writes the output file according to them"""
+    external_parameters = getopt.getopt(
+        sys.argv[1:] if argv_ is None else argv_, "", ["profile=", "cprofile"]
+    )
+
+    output_file_name: str = external_parameters[1][6]
+    with profiled_run(
+        "prep_progr_assessment3",
+        dict(external_parameters[0]).get('--profile'),
+        '--cprofile' in dict(external_parameters[0])
+    ):
+        write_timeseries_metrics(
+            input_file_path_=external_parameters[1][0],
+            separator_=external_parameters[1][1],
+            no_header_=bool(int(external_parameters[1][2])),
+            short_moving_average_length_=int(external_parameters[1][3]),
+            calculation_sequence_length_=int(external_parameters[1][4]),
+            is_moving_average_exponential_=bool(int(external_parameters[1][5])),
+            output_file_name_=output_file_name,
+            # Values can be passed in any order: vol, ma, macd, std
+            calculation_references_=external_parameters[1][7:]
+        )
+
+    print(f"Generated file {output_file_name}")
 
-# Maps functions to their abbreviations
-map_calculation_functions: dict[
-    str, Union[Callable[..., float], fn.partial]
-] = {
-    'vol': calculate_historical_volatility,
-    'ma': calculate_moving_average if not is_moving_average_exponential
-    else fn.partial(calculate_moving_average, exponential_=True),
-    'macd': fn.partial(
-        calculate_moving_average_crossover_divergence,
-        short_length_=short_moving_average_length
-    ),
-    'std': calculate_standard_deviation
-}
-
-input_file: pandas.DataFrame = pandas.read_csv(
-    input_file_path, sep=separator, header=(None if no_header else 0)
-)
-yieldRow: Generator[list[float], None, None] = generate_dataframe_rows(
-    *[input_file.iloc[:, column_index_] for column_index_ in range(input_file.shape[1])],
-    **dict((key_, map_calculation_functions[key_]) for key_ in calculation_references)
-)
-
-with open(
-    f"{input_file_path[:input_file_path.rfind(BACKSLASH)]}{BACKSLASH}"
-    f"{output_file_name}.csv",
-    'w', newline='', encoding='UTF8'
-) as f:
-    writer = csv.writer(f)
-
-    # Creates headers
-    writer.writerow(flatten_list(
-        [[
-            t_current_column := f"Column{column_index_}" if no_header
-            else input_file.columns.values[column_index_],
-            *[f"{t_current_column}_{metric_}" for metric_ in calculation_references]
-        ] for column_index_ in range(input_file.shape[1])]
-    ))
-
-    """Inserts rows that will not have metrics associated
-    due to residing at a row index less than the calculation length"""
-    for row_index_ in range(calculation_sequence_length - 1):
-        writer.writerow(flatten_list(
-            [[
-                float(input_file.iat[row_index_, column_index_]),
-                *[None for _ in calculation_references]
-            ] for column_index_ in range(input_file.shape[1])]
-        ))
-
-    for timestep_ in range(input_file.shape[0] - calculation_sequence_length + 1):
-        writer.writerow(next(yieldRow))
-
-print(f"Generated file {output_file_name}")
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
 """
 This module:
-- Imports the Sample and Probe classes from prep_progr_as4_classes.py.
-- Gathers the values of command line arguments passed.
-- Unpacks data from relevant files.
+- Imports the Sample class from prep_progr_as4_classes.py.
+- Gathers the values of command line arguments passed,
+when run as a script, through function 'main'.
+Importing the module does no work, and does not import
+pandas or NumPy, which are imported when first needed.
+- Unpacks data from relevant files, the locations of which
+are resolved by data_access.py.
 - Has functions defined for getting intersection and difference
 in probes of given samples.
 - Can handle any number of structure acronyms,
@@ -15,53 +19,36 @@ where a probe has one expression value,
 which is the value at the intersection of
 the probe's row index and the sample's column index
 from file 'MicroarrayExpression.csv'.
-- Modifies the probe objects stored
-in each sample object's 'probes' attribute
-to contain only probes that have their expression
-above the value defined by the respective command line argument.
+- Stores in each sample object's 'probes' attribute
+only probes that have their expression
+above the value defined by the respective command line argument,
+where the probes of all samples are filtered at once,
+and only the probes that passed the filtering
+are created as Probe objects.
 - Prints all Sample objects created, along with their attributes.
-- Prints results of functions calculating intersection and difference,
-as sets of probe IDs.
+- Measures the stages of a run, when the option '--profile=<path>'
+is passed, and writes the measurements to that path as JSON,
+also profiling each stage with cProfile with option '--cprofile'.
+- Prints the number of probe IDs shared between and unique to
+the samples, then the IDs themselves in pages of lines,
+the size of which can be set by the option '-p',
+or writes the IDs to the file passed with the option '-o'.
 """
 
+from __future__ import annotations
+
 import sys
-import os
 import getopt
-import math
-from functools import reduce
-from typing import Optional, Union, Any
+from typing import Optional, Any, Iterable, TYPE_CHECKING
 
-import pandas as pd
+from prep_progr_as4_classes import Sample, SampleGroup
+from pipeline_profiling import PipelineProfiler, get_profiler, profiled_run
 
-from prep_progr_as4_classes import Probe, Sample
+if TYPE_CHECKING:
+    import numpy as np
+    from probe_tools import ProbeCatalog
 
 NEWL = '\n'
-external_parameters = getopt.getopt(sys.argv[1:], "")
-
-cutoff_value = int(external_parameters[1][0])
-above_background: Optional[bool] = None
-sample_acronyms: list[str]
-try:
-    above_background = bool(int(external_parameters[1][-1]))
-    sample_acronyms = external_parameters[1][1:-1]
-except ValueError:
-    sample_acronyms = external_parameters[1][1:]
-
-def cast_cell_value(value_: Any) -> Union[int, str, None]:
-    """
-    For 'chromosome' column, where values may be of multiple types,
-    this function converts the cell value to
-    None if it is an empty value,
-    integer if it can be cast as that,
-    and leaves it unchanged if it is an arbitrary string.
-    """
-
-    if isinstance(value_, float) and math.isnan(value_):
-        return None
-    try:
-        return int(value_)
-    except ValueError:
-        return value_
 
 def get_intersection_in_probes(*samples: Sample) -> set[int]:
     """
@@ -73,13 +60,7 @@ def get_intersection_in_probes(*samples: Sample) -> set[int]:
     this function will most likely return all of the IDs.
     """
 
-    print("Probes shared between regions:")
-    return reduce(
-        lambda accumulator_, next_: accumulator_.intersection(next_),
-        map(set, [[
-            probe_.probe_id for probe_ in sample_.probes
-        ] for sample_ in samples])
-    )
+    return SampleGroup(samples).shared_probe_ids
 
 def get_difference_in_probes(*samples: Sample) -> dict[str, set[int]]:
     """
@@ -95,70 +76,157 @@ def get_difference_in_probes(*samples: Sample) -> dict[str, set[int]]:
     for all Samples.
     """
 
-    sys.stdout = open(os.devnull, 'w')
-    # This time the function will not print text
-    t_shared_expressions: set[float] = get_intersection_in_probes(*samples)
-    sys.stdout = sys.__stdout__
     return {
         f"Unique probe IDs for REGION: {sample_.structure_name}"
-        f"; ID: {sample_.structure_id}":
-        set(map(
-            lambda probe_: probe_.probe_id,
-            sample_.probes
-        )) - t_shared_expressions
-        for sample_ in samples
+        f"; ID: {sample_.structure_id}": unique_probe_ids_
+        for sample_, unique_probe_ids_ in zip(
+            samples, SampleGroup(samples).unique_probe_ids
+        )
     }
 
-probes_data: pd.DataFrame = pd.read_csv(
-    "C:\\Users\\andri\\Documents\\Hanze\\Programming 1\\Probes.csv"
-)
-samples_data: pd.DataFrame = pd.read_csv(
-    "C:\\Users\\andri\\Documents\\Hanze\\Programming 1"
-    "\\SampleAnnot.csv"
-)
-probe_samples_data: pd.DataFrame = pd.read_csv(
-    "C:\\Users\\andri\\Documents\\Hanze\\Programming 1"
-    "\\MicroarrayExpression.csv",
-    header=None
-).iloc[:, 1:]
-above_background_map: pd.DataFrame = pd.read_csv(
-    "C:\\Users\\andri\\Documents\\Hanze\\Programming 1\\PACall.csv",
-    header=None
-).iloc[:, 1:]
-
-selected_samples: list[Sample] = [Sample(
-    int(sample_row_[0]),
-    sample_acronym_,
-    sample_row_[5],
-    int(sample_row_[6]),
-    [Probe(
-        int(probes_data.loc[probe_row_index_, 'probe_id']),
-        int(probes_data.loc[probe_row_index_, 'gene_id']),
-        probes_data.loc[probe_row_index_, 'gene_name'],
-        cast_cell_value(probes_data.loc[probe_row_index_, 'chromosome']),
-        float(probe_samples_data.iat[probe_row_index_, sample_index_]),
-        bool(int(above_background_map.iat[probe_row_index_, sample_index_]))
-    ) for probe_row_index_ in range(probes_data.shape[0])]
-) for sample_acronym_ in sample_acronyms
-for sample_row_, sample_index_ in zip(
-    *(lambda row_: (row_.values, row_.index))(samples_data[
-        samples_data['structure_acronym'] == sample_acronym_
-    ])
-)]
-
-for sample_object_ in selected_samples:
-    if above_background is not None:
-        sample_object_.probes = \
-            sample_object_.get_probes_with_expression_greater_than(
-                cutoff_value, above_background
-            )
-    else:
-        sample_object_.probes = \
-            sample_object_.get_probes_with_expression_greater_than(
-                cutoff_value
-            )
-
-for sample_object_ in selected_samples:
-    print(sample_object_)
-print(get_intersection_in_probes(*selected_samples))
-print(get_difference_in_probes(*selected_samples))
+def create_sample(
+    sample_row_: Any,
+    sample_acronym_: str,
+    sample_index_: int,
+    probe_row_indices_: Iterable[int],
+    probe_catalog_: ProbeCatalog,
+    expression_matrix_: np.ndarray,
+    above_background_matrix_: np.ndarray
+) -> Sample:
+    """
+    Creates a Sample object from its row in 'SampleAnnot.csv',
+    with Probe objects created for the given probe row indices,
+    where the expression value of a probe is taken from
+    the column of 'MicroarrayExpression.csv' that belongs to the sample.
+    """
+
+    import numpy as np
+
+    t_rows: np.ndarray = np.asarray(probe_row_indices_, dtype=int)
+    return Sample.from_arrays(
+        int(sample_row_[0]),
+        sample_acronym_,
+        sample_row_[5],
+        int(sample_row_[6]),
+        **probe_catalog_.get_probe_columns(t_rows),
+        expressions_=expression_matrix_[t_rows, sample_index_],
+        above_background_=above_background_matrix_[t_rows, sample_index_]
+    )
+
+def get_selected_samples(
+    cutoff_value_: int,
+    sample_acronyms_: Iterable[str],
+    above_background_: Optional[bool] = None
+) -> list[Sample]:
+    """
+    Creates a Sample object for each sample that has any of the given
+    structure acronyms, in the order of the acronyms,
+    where each Sample keeps only the probes that have their expression
+    above the cutoff value, and optionally are also above background.
+    The filtering happens on the matrices, before any Probe object is created.
+    """
+
+    from data_access import \
+        load_probes, load_sample_annotations, load_expression_matrix, load_pa_calls
+    from probe_tools import ProbeCatalog, get_filtered_probe_rows_per_sample
+
+    t_profiler: PipelineProfiler = get_profiler()
+    with t_profiler.stage("load_data"):
+        t_samples_data = load_sample_annotations()
+        # Matrices and probe metadata are converted once, and indexed per sample
+        t_expression_matrix: np.ndarray = \
+            load_expression_matrix().iloc[:, 1:].to_numpy(dtype=float)
+        t_above_background_matrix: np.ndarray = \
+            load_pa_calls().iloc[:, 1:].to_numpy(dtype=int).astype(bool)
+        t_probe_catalog: ProbeCatalog = ProbeCatalog(load_probes())
+        t_profiler.count("probe_rows", len(t_probe_catalog))
+        t_profiler.count("sample_rows", t_samples_data.shape[0])
+
+    t_selected_sample_rows: list[tuple[Any, str, int]] = [
+        (sample_row_, sample_acronym_, sample_index_)
+        for sample_acronym_ in sample_acronyms_
+        for sample_row_, sample_index_ in zip(
+            *(lambda row_: (row_.values, row_.index))(t_samples_data[
+                t_samples_data['structure_acronym'] == sample_acronym_
+            ])
+        )
+    ]
+
+    with t_profiler.stage("filter_probes"):
+        t_filtered_probe_rows: dict[int, np.ndarray] = get_filtered_probe_rows_per_sample(
+            t_expression_matrix,
+            t_above_background_matrix,
+            [sample_index_ for _, _, sample_index_ in t_selected_sample_rows],
+            cutoff_value_,
+            bool(above_background_)
+        )
+        t_profiler.count(
+            "expression_values_processed",
+            len(t_filtered_probe_rows) * len(t_probe_catalog)
+        )
+    with t_profiler.stage("construct_samples"):
+        t_selected_samples: list[Sample] = [
+            create_sample(
+                sample_row_, sample_acronym_, sample_index_,
+                t_filtered_probe_rows[sample_index_], t_probe_catalog,
+                t_expression_matrix, t_above_background_matrix
+            ) for sample_row_, sample_acronym_, sample_index_ in t_selected_sample_rows
+        ]
+        t_profiler.count("samples_created", len(t_selected_samples))
+        t_profiler.count("probes_created", sum(
+            len(sample_.probes) for sample_ in t_selected_samples
+        ))
+    return t_selected_samples
+
+def main(argv_: Optional[list[str]] = None) -> None:
+    """
+    Gathers the values of the command line arguments,
+    then creates, filters and prints the selected samples,
+    and reports the probes shared between and unique to them.
+    With option '--profile=<path>', the stages are measured,
+    and the report is written to the given path as JSON.
+    """
+
+    external_parameters = getopt.getopt(
+        sys.argv[1:] if argv_ is None else argv_, "o:p:", ["profile=", "cprofile"]
+    )
+    report_file_path: Optional[str] = dict(external_parameters[0]).get('-o')
+    report_page_size: int = int(dict(external_parameters[0]).get('-p', 1000))
+
+    cutoff_value = int(external_parameters[1][0])
+    above_background: Optional[bool] = None
+    sample_acronyms: list[str]
+    try:
+        above_background = bool(int(external_parameters[1][-1]))
+        sample_acronyms = external_parameters[1][1:-1]
+    except ValueError:
+        sample_acronyms = external_parameters[1][1:]
+
+    with profiled_run(
+        "prep_progr_assessment4",
+        dict(external_parameters[0]).get('--profile'),
+        '--cprofile' in dict(external_parameters[0])
+    ) as profiler_:
+        selected_samples: list[Sample] = get_selected_samples(
+            cutoff_value, sample_acronyms, above_background
+        )
+
+        selected_sample_group: SampleGroup = SampleGroup(selected_samples)
+        with profiler_.stage("set_algebra"):
+            # Accessing the cached results calculates them
+            selected_sample_group.unique_probe_ids
+
+        with profiler_.stage("write_output"):
+            for sample_object_ in selected_samples:
+                print(sample_object_)
+            print(selected_sample_group)
+            if report_file_path is not None:
+                with open(report_file_path, 'w', encoding='UTF-8') as report_file_:
+                    selected_sample_group.write_report(report_file_)
+                print(f"Wrote probe IDs to file {report_file_path}")
+            else:
+                for report_page_ in selected_sample_group.iter_report_pages(report_page_size):
+                    print(report_page_)
+
+if __name__ == '__main__':
+    main()
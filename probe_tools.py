@@ -0,0 +1,310 @@
+"""
+This module:
+- Contains reusable functions for the probe expression analyses
+of prep_progr_assessment2.py and prep_progr_assessment4.py.
+- Works on aligned column arrays instead of per-gene or per-probe
+lookups, so that each computation is a single pass over the data.
+- Filters the probes of many samples at once, before any Probe object
+is created for them.
+- Contains the ProbeCatalog class, which stores the metadata
+from 'Probes.csv' as arrays, indexed by probe ID and gene ID.
+- Can read 'MicroarrayExpression.csv' in row chunks, and only the columns
+of the samples that are needed, instead of the whole matrix at once.
+"""
+
+import sys
+import math
+from typing import Union, Iterable, Optional, Any
+
+import numpy as np
+import pandas as pd
+
+def cast_cell_value(value_: Any) -> Union[int, str, None]:
+    """
+    For 'chromosome' column, where values may be of multiple types,
+    this function converts the cell value to
+    None if it is an empty value,
+    integer if it can be cast as that,
+    and leaves it unchanged if it is an arbitrary string.
+    """
+
+    if isinstance(value_, float) and math.isnan(value_):
+        return None
+    try:
+        return int(value_)
+    except ValueError:
+        return value_
+
+class ProbeCatalog:
+    """
+    Stores the metadata of all probes from 'Probes.csv',
+    which is read once, as contiguous arrays, where
+    - 'probe_ids' and 'gene_ids' are integer arrays.
+    - 'chromosomes' stores the values of column 'chromosome'
+    converted by 'cast_cell_value'.
+    - 'gene_name_codes' stores the position of each probe's gene name
+    in 'gene_names', where each distinct name is stored only once.
+    The position of a probe in the arrays is the same as its row index
+    in 'Probes.csv', which is also its row index
+    in 'MicroarrayExpression.csv' and 'PACall.csv'.
+    Rows can be looked up by probe ID and by gene ID through hash indexes,
+    for many IDs at once.
+    """
+
+    def __init__(self, probes_data_: pd.DataFrame) -> None:
+        self.probe_ids: np.ndarray = probes_data_['probe_id'].to_numpy(dtype=np.int64)
+        self.gene_ids: np.ndarray = probes_data_['gene_id'].to_numpy(dtype=np.int64)
+        self.chromosomes: np.ndarray = np.asarray(
+            [cast_cell_value(value_) for value_ in probes_data_['chromosome']],
+            dtype=object
+        )
+        t_codes, t_names = pd.factorize(
+            probes_data_['gene_name'], use_na_sentinel=False
+        )
+        self.gene_name_codes: np.ndarray = t_codes.astype(np.int32)
+        self.gene_names: np.ndarray = np.asarray([
+            sys.intern(name_) if isinstance(name_, str) else name_
+            for name_ in t_names
+        ], dtype=object)
+
+        self.probe_index: pd.Index = pd.Index(self.probe_ids)
+        assert self.probe_index.is_unique, "Probe IDs have to be unique"
+        t_order: np.ndarray = np.argsort(self.gene_ids, kind='stable')
+        t_sorted_gene_ids: np.ndarray = self.gene_ids[t_order]
+        t_group_starts: np.ndarray = np.flatnonzero(np.concatenate((
+            [True], t_sorted_gene_ids[1:] != t_sorted_gene_ids[:-1]
+        ))) if t_order.size > 0 else np.empty(0, dtype=int)
+        self.gene_index: dict[int, np.ndarray] = dict(zip(
+            t_sorted_gene_ids[t_group_starts].tolist(),
+            np.split(t_order, t_group_starts[1:])
+        ))
+
+    @classmethod
+    def from_csv(cls, probes_path_: str) -> 'ProbeCatalog':
+        """
+        Creates a ProbeCatalog from the file 'Probes.csv' at the given path.
+        """
+
+        return cls(pd.read_csv(probes_path_))
+
+    def __len__(self) -> int:
+        return self.probe_ids.size
+
+    def get_rows(self, probe_ids_: Iterable[int]) -> np.ndarray:
+        """
+        Returns the row index of each given probe ID,
+        and raises KeyError if any of them is not in the catalog.
+        """
+
+        t_probe_ids: np.ndarray = np.asarray(probe_ids_, dtype=np.int64)
+        t_rows: np.ndarray = self.probe_index.get_indexer(t_probe_ids)
+        if (t_rows < 0).any():
+            raise KeyError(f"Unknown probe IDs: {t_probe_ids[t_rows < 0].tolist()}")
+        return t_rows
+
+    def get_gene_rows(self, gene_ids_: Iterable[int]) -> np.ndarray:
+        """
+        Returns the row indices of all probes of the given gene IDs,
+        grouped by gene ID in the order the IDs were given.
+        Gene IDs that are not in the catalog have no rows.
+        """
+
+        t_empty: np.ndarray = np.empty(0, dtype=np.intp)
+        return np.concatenate([t_empty] + [
+            self.gene_index.get(gene_id_, t_empty) for gene_id_ in map(int, gene_ids_)
+        ])
+
+    def get_gene_ids(self, probe_ids_: Iterable[int]) -> np.ndarray:
+        """
+        Returns the gene ID of each given probe ID.
+        """
+
+        return self.gene_ids[self.get_rows(probe_ids_)]
+
+    def get_gene_names(self, rows_: np.ndarray) -> np.ndarray:
+        """
+        Returns the gene name of the probe at each given row index.
+        """
+
+        return self.gene_names[self.gene_name_codes[rows_]]
+
+    def get_probe_columns(self, rows_: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        Returns the metadata of the probes at the given row indices,
+        keyed by the names of the matching parameters of Sample.from_arrays.
+        """
+
+        return {
+            'probe_ids_': self.probe_ids[rows_],
+            'gene_ids_': self.gene_ids[rows_],
+            'gene_names_': self.get_gene_names(rows_),
+            'chromosomes_': self.chromosomes[rows_]
+        }
+
+def get_top_probes_per_gene(
+    probe_ids_: Iterable[int],
+    gene_ids_: Iterable[int],
+    values_: Iterable[float]
+) -> dict[int, dict[str, Union[float, list[int]]]]:
+    """
+    From three aligned sequences, where the element at the same position
+    describes the same probe, returns for each gene ID
+    the highest value among its probes,
+    and the IDs of all probes of that gene that have this value.
+    Respective id(s) is a list, because multiple probes of a gene
+    may share the highest value.
+    The rows are sorted once by gene ID and descending value,
+    so the first row of each gene group holds its maximum.
+    Genes whose probes all have a missing value are left out.
+    """
+
+    t_probe_ids: np.ndarray = np.asarray(probe_ids_)
+    t_gene_ids: np.ndarray = np.asarray(gene_ids_)
+    t_values: np.ndarray = np.asarray(values_, dtype=float)
+    assert t_probe_ids.shape == t_gene_ids.shape == t_values.shape, \
+        "Probe IDs, gene IDs and values have to be of the same length"
+
+    t_present: np.ndarray = ~np.isnan(t_values)
+    t_probe_ids = t_probe_ids[t_present]
+    t_gene_ids = t_gene_ids[t_present]
+    t_values = t_values[t_present]
+    if t_values.size == 0:
+        return {}
+
+    # np.lexsort sorts by the last key first
+    t_order: np.ndarray = np.lexsort((-t_values, t_gene_ids))
+    t_probe_ids = t_probe_ids[t_order]
+    t_gene_ids = t_gene_ids[t_order]
+    t_values = t_values[t_order]
+
+    t_group_starts: np.ndarray = np.flatnonzero(np.concatenate((
+        [True], t_gene_ids[1:] != t_gene_ids[:-1]
+    )))
+    t_group_sizes: np.ndarray = np.diff(
+        np.append(t_group_starts, t_gene_ids.size)
+    )
+    t_is_highest: np.ndarray = t_values == np.repeat(
+        t_values[t_group_starts], t_group_sizes
+    )
+
+    # Rows holding a maximum stay contiguous per gene after masking
+    t_highest_gene_ids: np.ndarray = t_gene_ids[t_is_highest]
+    t_highest_probe_ids: np.ndarray = t_probe_ids[t_is_highest]
+    t_tie_boundaries: np.ndarray = np.flatnonzero(
+        t_highest_gene_ids[1:] != t_highest_gene_ids[:-1]
+    ) + 1
+
+    return {
+        int(gene_id_): {
+            "highest_avg": float(highest_value_),
+            "respective_probe_id(s)": probe_ids_group_.tolist()
+        } for gene_id_, highest_value_, probe_ids_group_ in zip(
+            t_gene_ids[t_group_starts],
+            t_values[t_group_starts],
+            np.split(t_highest_probe_ids, t_tie_boundaries)
+        )
+    }
+
+def get_probe_expression_averages(
+    expression_path_: str,
+    chunk_size_: Optional[int] = None
+) -> pd.Series:
+    """
+    Returns the average expression of each probe across all samples
+    from the file 'MicroarrayExpression.csv' at the given path,
+    indexed by the probe IDs from its first column.
+    If 'chunk_size_' is given, the file is read that many rows at a time,
+    so only one chunk of the matrix is kept in memory.
+    """
+
+    t_chunks: Iterable[pd.DataFrame] = pd.read_csv(
+        expression_path_, header=None, chunksize=chunk_size_
+    ) if chunk_size_ else [pd.read_csv(expression_path_, header=None)]
+    return pd.concat([
+        pd.Series(
+            chunk_.iloc[:, 1:].mean(axis=1).values,
+            index=chunk_.iloc[:, 0]
+        ) for chunk_ in t_chunks
+    ])
+
+def get_region_sample_hits(
+    expression_path_: str,
+    samples_data_: pd.DataFrame,
+    structure_acronyms_: Iterable[str],
+    cutoff_: float = 15,
+    chunk_size_: Optional[int] = None
+) -> dict[str, dict[str, list[int]]]:
+    """
+    For each given structure acronym, retrieves those expression value
+    columns from 'MicroarrayExpression.csv',
+    where the column belongs to a row of 'SampleAnnot.csv'
+    with that value in column "structure_acronym",
+    and returns the row numbers where the expression value
+    is higher than the cutoff, for each sample column.
+    Only the columns of the matched samples are read,
+    and if 'chunk_size_' is given, they are read that many rows at a time,
+    where the row numbers found in each chunk are appended
+    to those found in the previous ones.
+    The first column of the file holds the probe IDs,
+    so the column of a sample is at its row index in 'SampleAnnot.csv' + 1.
+    """
+
+    t_sample_columns: dict[str, dict[int, str]] = {
+        acronym_: {
+            position_ + 1: f"expression_values_column_{index_}"
+            for position_, index_ in zip(
+                np.flatnonzero(samples_data_["structure_acronym"] == acronym_),
+                samples_data_.index[samples_data_["structure_acronym"] == acronym_]
+            )
+        } for acronym_ in dict.fromkeys(structure_acronyms_)
+    }
+    t_used_columns: list[int] = sorted(set().union(*(
+        columns_ for columns_ in t_sample_columns.values()
+    )))
+    t_hits: dict[str, dict[str, list[int]]] = {
+        acronym_: {header_: [] for header_ in columns_.values()}
+        for acronym_, columns_ in t_sample_columns.items()
+    }
+    if not t_used_columns:
+        return t_hits
+
+    t_chunks: Iterable[pd.DataFrame] = pd.read_csv(
+        expression_path_, header=None, usecols=t_used_columns, chunksize=chunk_size_
+    ) if chunk_size_ else [pd.read_csv(
+        expression_path_, header=None, usecols=t_used_columns
+    )]
+    t_row_offset: int = 0
+    for chunk_ in t_chunks:
+        for acronym_, columns_ in t_sample_columns.items():
+            for column_, header_ in columns_.items():
+                t_hits[acronym_][header_].extend((
+                    np.flatnonzero(chunk_[column_].to_numpy() > cutoff_) + t_row_offset
+                ).tolist())
+        t_row_offset += chunk_.shape[0]
+    return t_hits
+
+def get_filtered_probe_rows_per_sample(
+    expression_: np.ndarray,
+    above_background_map_: np.ndarray,
+    sample_columns_: Iterable[int],
+    cutoff_: float,
+    above_background_: bool = False
+) -> dict[int, np.ndarray]:
+    """
+    From the expression and above background matrices
+    (probes as rows, samples as columns), returns a dictionary,
+    where keys are the given sample column indices,
+    and values are the row indices of the probes that pass
+    the same filtering as Sample.get_probes_with_expression_greater_than.
+    All samples are compared to the cutoff at once, so that
+    Probe objects only have to be created for the passing rows.
+    """
+
+    t_columns: list[int] = list(dict.fromkeys(sample_columns_))
+    t_passed: np.ndarray = expression_[:, t_columns] > cutoff_
+    if above_background_:
+        t_passed &= above_background_map_[:, t_columns]
+    return {
+        column_: np.flatnonzero(t_passed[:, position_])
+        for position_, column_ in enumerate(t_columns)
+    }
@@ -0,0 +1,355 @@
+"""
+This module:
+- Encodes nucleotide sequences as uint8 arrays, where A, C, G and T
+(in either case) are 0, 1, 2 and 3, and any other character,
+such as N, is UNKNOWN_BASE.
+- Calculates the GC content of each window sliding over a sequence,
+from cumulative sums of the G and C bases, instead of counting
+the bases of each window separately.
+- Counts the k-mers of a sequence, where each k-mer is hashed
+to an integer with 2 bits per base, and the hashes are counted
+with a NumPy bincount. K-mers with unknown bases are not counted.
+The profiles of many sequences store only the k-mers that occur,
+as pairs of hash and count, since a dense row of 4 ** k counts
+per sequence does not fit in memory for longer k-mers.
+- Reads the "ORIGIN" sections of GenBank files one record at a time,
+so files with many records are not read into memory at once.
+- Calculates the same profiles for the sequences of the features
+of a record, which are built from the intervals of their locations
+parsed by GenBankParser, with the intervals on the reverse strand
+reverse complemented, and stored as arrays delimited by offsets.
+- When run as a script, through function 'main', writes the profiles
+of every record of the GenBank files passed as arguments to a NumPy
+.npz file next to each of them, named after the input file
+and postfixed with "_profiles". The window length, the step between
+windows and the k-mer length can be set with options '-w', '-s' and '-k',
+and option '-f' adds the profiles of the features of the first record.
+"""
+
+import sys
+import getopt
+from pathlib import Path
+from typing import Iterator, Iterable, Optional, Union, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from genbank_locations import FeatureLocations
+
+UNKNOWN_BASE = 4
+# Largest k-mer length, for which the counts of all k-mers take 128 MiB
+MAX_KMER_LENGTH = 12
+
+_BASE_CODES: np.ndarray = np.full(256, UNKNOWN_BASE, dtype=np.uint8)
+for code_, bases_ in enumerate(["Aa", "Cc", "Gg", "Tt"]):
+    _BASE_CODES[[ord(base_) for base_ in bases_]] = code_
+
+# Code of the complementary base of each code, where unknown bases stay unknown
+_COMPLEMENT_CODES: np.ndarray = np.asarray([3, 2, 1, 0, UNKNOWN_BASE], dtype=np.uint8)
+
+# Characters of the "ORIGIN" section that are not bases
+_ORIGIN_LAYOUT_CHARACTERS: bytes = b"0123456789 \t\r\n/"
+
+def encode_sequence(sequence_: Union[str, bytes]) -> np.ndarray:
+    """
+    Returns the code of each base of the sequence as a uint8 array.
+    """
+
+    if isinstance(sequence_, str):
+        sequence_ = sequence_.encode('ascii')
+    return _BASE_CODES[np.frombuffer(sequence_, dtype=np.uint8)]
+
+def get_gc_content(
+    codes_: np.ndarray,
+    window_length_: int,
+    step_: int = 1
+) -> np.ndarray:
+    """
+    Returns the GC content of each window of 'window_length_' bases,
+    starting at every 'step_'th base, as the fraction of G and C bases
+    among the known bases of the window.
+    Windows without known bases have a GC content of NaN.
+    A sequence shorter than the window has no windows.
+    """
+
+    assert window_length_ > 0 and step_ > 0, \
+        "Window length and step have to be positive"
+    if codes_.size < window_length_:
+        return np.empty(0, dtype=np.float64)
+
+    # Sums of the first i bases, so each window's sum is a difference of two
+    t_gc_sums: np.ndarray = np.concatenate((
+        [0], np.cumsum((codes_ == 1) | (codes_ == 2), dtype=np.int64)
+    ))
+    t_known_sums: np.ndarray = np.concatenate((
+        [0], np.cumsum(codes_ != UNKNOWN_BASE, dtype=np.int64)
+    ))
+    t_starts: np.ndarray = np.arange(0, codes_.size - window_length_ + 1, step_)
+    t_known_counts: np.ndarray = \
+        t_known_sums[t_starts + window_length_] - t_known_sums[t_starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(
+            t_known_counts > 0,
+            (t_gc_sums[t_starts + window_length_] - t_gc_sums[t_starts]) / t_known_counts,
+            np.nan
+        )
+
+def get_location_codes(
+    origin_codes_: np.ndarray,
+    locations_: 'FeatureLocations',
+    location_index_: int
+) -> np.ndarray:
+    """
+    Returns the codes of the sequence of a feature, built from the intervals
+    of its location in the encoded origin, in the order they are read in,
+    where the intervals on the reverse strand are reverse complemented.
+    Intervals on other records are left out.
+    """
+
+    from genbank_locations import REMOTE, REVERSE_STRAND
+
+    t_slice: slice = locations_.get_interval_slice(location_index_)
+    return np.concatenate([np.empty(0, dtype=np.uint8)] + [
+        _COMPLEMENT_CODES[origin_codes_[start_:end_][::-1]]
+        if strand_ == REVERSE_STRAND else origin_codes_[start_:end_]
+        for start_, end_, strand_, flags_ in zip(
+            locations_.starts[t_slice].tolist(),
+            locations_.ends[t_slice].tolist(),
+            locations_.strands[t_slice].tolist(),
+            locations_.flags[t_slice].tolist()
+        ) if not flags_ & REMOTE
+    ])
+
+def get_kmer_hashes(codes_: np.ndarray, kmer_length_: int) -> np.ndarray:
+    """
+    Returns the hash of each k-mer of the sequence that only has
+    known bases, in the order they start in, where each base
+    takes 2 bits of the hash, the first base being the highest ones.
+    The hashes are built by shifting in one base at a time,
+    for all k-mers at once.
+    """
+
+    assert 0 < kmer_length_ <= MAX_KMER_LENGTH, \
+        f"K-mer length has to be between 1 and {MAX_KMER_LENGTH}"
+    t_kmer_count: int = codes_.size - kmer_length_ + 1
+    if t_kmer_count <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    t_hashes: np.ndarray = np.zeros(t_kmer_count, dtype=np.int64)
+    for offset_ in range(kmer_length_):
+        t_hashes <<= 2
+        t_hashes |= codes_[offset_ : offset_ + t_kmer_count] & 3
+    t_unknown_sums: np.ndarray = np.concatenate((
+        [0], np.cumsum(codes_ == UNKNOWN_BASE, dtype=np.int64)
+    ))
+    return t_hashes[
+        t_unknown_sums[kmer_length_:] == t_unknown_sums[:t_kmer_count]
+    ]
+
+def get_kmer_counts(codes_: np.ndarray, kmer_length_: int) -> np.ndarray:
+    """
+    Returns the number of times each k-mer occurs in the sequence,
+    where the count of a k-mer is at the position of its hash,
+    so the counts are in lexicographic order of the k-mers (ACGT).
+    """
+
+    return np.bincount(
+        get_kmer_hashes(codes_, kmer_length_), minlength=4 ** kmer_length_
+    )
+
+def get_sparse_kmer_counts(
+    codes_: np.ndarray,
+    kmer_length_: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the hashes of the k-mers that occur in the sequence,
+    in ascending order, along with the number of times each occurs.
+    Counts are taken with a bincount if the sequence has more k-mers
+    than there are distinct k-mers, and by sorting the hashes otherwise,
+    so no more memory is used than for the k-mers of the sequence.
+    """
+
+    t_hashes: np.ndarray = get_kmer_hashes(codes_, kmer_length_)
+    if t_hashes.size >= 4 ** kmer_length_:
+        t_counts: np.ndarray = np.bincount(t_hashes, minlength=4 ** kmer_length_)
+        t_present: np.ndarray = np.flatnonzero(t_counts)
+        return t_present.astype(np.int64), t_counts[t_present]
+    t_unique_hashes, t_unique_counts = np.unique(t_hashes, return_counts=True)
+    return t_unique_hashes, t_unique_counts.astype(np.int64)
+
+def get_kmer_names(
+    kmer_length_: int,
+    hashes_: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Returns the k-mer of each given hash, or if no hashes are given,
+    the k-mer of each position of the counts returned by 'get_kmer_counts'.
+    """
+
+    t_hashes: np.ndarray = np.arange(4 ** kmer_length_) if hashes_ is None \
+        else np.asarray(hashes_, dtype=np.int64)
+    t_names: np.ndarray = np.full(t_hashes.shape, '', dtype=f"<U{kmer_length_}")
+    for position_ in range(kmer_length_):
+        t_names = np.char.add(t_names, np.asarray(list("ACGT"))[
+            (t_hashes >> (2 * (kmer_length_ - 1 - position_))) & 3
+        ])
+    return t_names
+
+def iter_genbank_origins(
+    genbank_path_: Union[str, Path]
+) -> Iterator[tuple[str, np.ndarray]]:
+    """
+    Reads the GenBank file line by line, and yields the name
+    from the "LOCUS" line and the encoded "ORIGIN" section of each record.
+    Only the sequence of the current record is held in memory.
+    """
+
+    t_name: str = ''
+    t_lines: Optional[list[bytes]] = None
+    with open(genbank_path_, 'rb') as file_:
+        for line_ in file_:
+            if line_.startswith(b"LOCUS"):
+                t_fields: list[bytes] = line_.split()
+                t_name = t_fields[1].decode() if len(t_fields) > 1 else ''
+            elif line_.startswith(b"ORIGIN"):
+                t_lines = []
+            elif line_.startswith(b"//"):
+                if t_lines is not None:
+                    yield t_name, encode_sequence(b''.join(t_lines))
+                t_lines = None
+            elif t_lines is not None:
+                t_lines.append(line_.translate(None, _ORIGIN_LAYOUT_CHARACTERS))
+    # The last record may not be terminated
+    if t_lines is not None:
+        yield t_name, encode_sequence(b''.join(t_lines))
+
+def get_sequence_profiles(
+    sequences_: Iterable[Union[str, np.ndarray]],
+    window_length_: int,
+    step_: int,
+    kmer_length_: int
+) -> dict[str, np.ndarray]:
+    """
+    Calculates the profiles of many sequences, such as the sequences
+    of Feature objects, which are encoded first if given as text.
+    Returns
+    - 'gc_content', the windows of all sequences one after the other,
+    where the windows of sequence i are between
+    'gc_offsets'[i] and 'gc_offsets'[i + 1].
+    - 'kmer_hashes' and 'kmer_counts', the k-mers that occur in each
+    sequence and their counts from 'get_sparse_kmer_counts', one sequence
+    after the other, where those of sequence i are between
+    'kmer_offsets'[i] and 'kmer_offsets'[i + 1].
+    """
+
+    t_gc_contents: list[np.ndarray] = []
+    t_kmer_hashes: list[np.ndarray] = []
+    t_kmer_counts: list[np.ndarray] = []
+    for sequence_ in sequences_:
+        t_codes: np.ndarray = encode_sequence(sequence_) \
+            if isinstance(sequence_, str) else sequence_
+        t_gc_contents.append(get_gc_content(t_codes, window_length_, step_))
+        t_hashes, t_counts = get_sparse_kmer_counts(t_codes, kmer_length_)
+        t_kmer_hashes.append(t_hashes)
+        t_kmer_counts.append(t_counts)
+    return {
+        'gc_content': np.concatenate(
+            [np.empty(0, dtype=np.float64)] + t_gc_contents
+        ),
+        'gc_offsets': np.concatenate((
+            [0], np.cumsum([gc_content_.size for gc_content_ in t_gc_contents])
+        )).astype(np.int64),
+        'kmer_hashes': np.concatenate([np.empty(0, dtype=np.int64)] + t_kmer_hashes),
+        'kmer_counts': np.concatenate([np.empty(0, dtype=np.int64)] + t_kmer_counts),
+        'kmer_offsets': np.concatenate((
+            [0], np.cumsum([hashes_.size for hashes_ in t_kmer_hashes])
+        )).astype(np.int64)
+    }
+
+def write_sequence_profiles(
+    genbank_path_: Union[str, Path],
+    window_length_: int = 1000,
+    step_: int = 100,
+    kmer_length_: int = 4,
+    features_: bool = False
+) -> Path:
+    """
+    Writes the GC content windows and k-mer counts of each record
+    of the GenBank file to a .npz file next to it, with the arrays
+    returned by 'get_sequence_profiles', and the record names
+    in 'record_names'. The k-mers of the hashes can be restored
+    with 'get_kmer_names'.
+    The records are profiled one at a time while reading the file.
+    If 'features_' is True, the profiles of the sequences of the features
+    of the first record, built by 'get_location_codes' from the locations
+    parsed by GenBankParser, are added with the prefix 'feature_',
+    along with the feature types.
+    Returns the path of the output file.
+    """
+
+    t_names: list[str] = []
+    # Codes of the first record, kept for its features
+    t_first_codes: list[np.ndarray] = []
+
+    def iter_record_codes() -> Iterator[np.ndarray]:
+        for name_, codes_ in iter_genbank_origins(genbank_path_):
+            t_names.append(name_)
+            if features_ and not t_first_codes:
+                t_first_codes.append(codes_)
+            yield codes_
+
+    t_arrays: dict[str, np.ndarray] = get_sequence_profiles(
+        iter_record_codes(), window_length_, step_, kmer_length_
+    )
+    t_arrays['record_names'] = np.asarray(t_names, dtype=str)
+    t_arrays['parameters'] = np.asarray([window_length_, step_, kmer_length_])
+
+    if features_:
+        from final_assignment import GenBankParser
+
+        t_parser: GenBankParser = GenBankParser(str(genbank_path_))
+        t_parser.extractLocations()
+        # The parser's origin only keeps the bases 'acgt', and runs to the end of the file,
+        # so the positions are taken from the first record as read above
+        t_origin_codes: np.ndarray = t_first_codes[0] if t_first_codes \
+            else np.empty(0, dtype=np.uint8)
+        t_arrays.update({
+            f"feature_{key_}": value_ for key_, value_ in get_sequence_profiles(
+                (
+                    get_location_codes(t_origin_codes, t_parser.locations, index_)
+                    for index_ in range(len(t_parser.locations))
+                ),
+                window_length_, step_, kmer_length_
+            ).items()
+        })
+        t_arrays['feature_types'] = np.asarray(
+            [specification_['type'] for specification_ in t_parser.specifications],
+            dtype=str
+        )
+
+    t_input_path: Path = Path(genbank_path_)
+    t_output_path: Path = t_input_path.with_name(t_input_path.stem + "_profiles.npz")
+    np.savez(t_output_path, **t_arrays)
+    return t_output_path
+
+def main(argv_: Optional[list[str]] = None) -> None:
+    """
+    Gathers the values of the command line arguments,
+    and writes the profiles of each GenBank file passed.
+    """
+
+    external_parameters = getopt.getopt(
+        sys.argv[1:] if argv_ is None else argv_, "w:s:k:f"
+    )
+    for genbank_path_ in external_parameters[1]:
+        output_path: Path = write_sequence_profiles(
+            genbank_path_,
+            int(dict(external_parameters[0]).get('-w', 1000)),
+            int(dict(external_parameters[0]).get('-s', 100)),
+            int(dict(external_parameters[0]).get('-k', 4)),
+            '-f' in dict(external_parameters[0])
+        )
+        print(f"Created file at location '{output_path}'")
+
+if __name__ == '__main__':
+    main()
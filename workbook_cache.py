@@ -0,0 +1,177 @@
+"""
+This module:
+- Loads sheets of Excel workbooks, such as DaMN.xlsx, into DataFrames.
+- Parses a sheet only the first time it is loaded, and stores it
+in a typed, columnar cache file, the name of which contains the hash
+of the workbook's content, so a changed workbook is parsed again.
+- Stores the cache as Parquet if pyarrow is installed,
+all column headers are strings and pyarrow can convert every column,
+otherwise as a NumPy .npz file with one array per column.
+- Can load multiple workbooks in a pool of processes.
+"""
+
+import os
+import re
+import hashlib
+import importlib.util
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# pandas writes Parquet through pyarrow, which is an optional dependency
+PARQUET_AVAILABLE: bool = importlib.util.find_spec("pyarrow") is not None
+
+CACHE_DIRECTORY_NAME = ".workbook_cache"
+
+def get_file_hash(file_path_: str, block_size_: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 hash of a file's content,
+    reading it in blocks of 'block_size_' bytes.
+    """
+
+    t_hash = hashlib.sha256()
+    with open(file_path_, 'rb') as file_:
+        while t_block := file_.read(block_size_):
+            t_hash.update(t_block)
+    return t_hash.hexdigest()
+
+def get_cache_path(
+    workbook_path_: str,
+    sheet_name_: Union[str, int],
+    cache_directory_: Optional[str] = None
+) -> str:
+    """
+    Returns the path of the cache file of a workbook's sheet,
+    without its extension, which depends on the format it is stored in.
+    By default, the cache is stored in a directory named
+    '.workbook_cache', next to the workbook.
+    """
+
+    t_directory: str = cache_directory_ or os.path.join(
+        os.path.dirname(os.path.abspath(workbook_path_)), CACHE_DIRECTORY_NAME
+    )
+    return os.path.join(
+        t_directory,
+        f"{get_file_hash(workbook_path_)}_"
+        f"{re.sub(r'[^A-Za-z0-9_-]', '_', str(sheet_name_))}"
+    )
+
+def write_npz(data_: pd.DataFrame, file_) -> None:
+    """
+    Writes a DataFrame to an open binary file as .npz,
+    with one array per column and an array of the column names.
+    """
+
+    np.savez(
+        file_,
+        column_names=np.asarray(data_.columns, dtype=object),
+        **{
+            f"column_{index_}": data_.iloc[:, index_].to_numpy()
+            for index_ in range(data_.shape[1])
+        }
+    )
+
+def write_cache(data_: pd.DataFrame, cache_path_: str) -> None:
+    """
+    Stores a DataFrame at the cache path, as Parquet if possible,
+    otherwise as .npz, where the file is first written under
+    a temporary name, so an interrupted write leaves no broken cache.
+    Columns that pyarrow cannot convert, such as object columns
+    mixing numbers and strings, make it fall back to .npz.
+    """
+
+    os.makedirs(os.path.dirname(cache_path_), exist_ok=True)
+    t_parquet: bool = PARQUET_AVAILABLE and all(
+        isinstance(column_, str) for column_ in data_.columns
+    )
+    t_descriptor, t_temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(cache_path_)
+    )
+    try:
+        with os.fdopen(t_descriptor, 'wb') as file_:
+            if t_parquet:
+                # pyarrow's conversion errors subclass these builtin errors
+                try:
+                    data_.to_parquet(file_, index=False)
+                except (ValueError, TypeError, NotImplementedError):
+                    t_parquet = False
+                    file_.seek(0)
+                    file_.truncate()
+            if not t_parquet:
+                write_npz(data_, file_)
+        os.replace(
+            t_temporary_path, cache_path_ + ('.parquet' if t_parquet else '.npz')
+        )
+    except BaseException:
+        os.remove(t_temporary_path)
+        raise
+
+def read_cache(cache_path_: str) -> Optional[pd.DataFrame]:
+    """
+    Returns the DataFrame stored at the cache path,
+    or None if it has not been cached yet.
+    """
+
+    if os.path.exists(cache_path_ + '.parquet'):
+        return pd.read_parquet(cache_path_ + '.parquet')
+    if os.path.exists(cache_path_ + '.npz'):
+        # Object columns are pickled, which is safe for cache files written here
+        with np.load(cache_path_ + '.npz', allow_pickle=True) as arrays_:
+            t_column_names: list = arrays_['column_names'].tolist()
+            return pd.DataFrame({
+                column_name_: arrays_[f"column_{index_}"]
+                for index_, column_name_ in enumerate(t_column_names)
+            }, columns=t_column_names)
+    return None
+
+def load_workbook(
+    workbook_path_: str,
+    sheet_name_: Union[str, int] = 0,
+    cache_directory_: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Returns a sheet of a workbook as a DataFrame,
+    read from the cache if the workbook was loaded before
+    with the same content, otherwise parsed and then cached.
+    """
+
+    t_cache_path: str = get_cache_path(
+        workbook_path_, sheet_name_, cache_directory_
+    )
+    t_data: Optional[pd.DataFrame] = read_cache(t_cache_path)
+    if t_data is None:
+        t_data = pd.read_excel(workbook_path_, sheet_name=sheet_name_)
+        write_cache(t_data, t_cache_path)
+    return t_data
+
+def load_workbooks(
+    workbook_paths_: Iterable[str],
+    sheet_name_: Union[str, int] = 0,
+    cache_directory_: Optional[str] = None,
+    worker_count_: int = 1
+) -> pd.DataFrame:
+    """
+    Loads the same sheet of each given workbook with 'load_workbook',
+    in a pool of 'worker_count_' processes if more than one is given,
+    and returns the rows of all of them in one DataFrame,
+    in the order the workbooks were given.
+    """
+
+    t_paths: list[str] = list(workbook_paths_)
+    assert len(t_paths) > 0, "At least one workbook has to be given"
+    if worker_count_ > 1 and len(t_paths) > 1:
+        with ProcessPoolExecutor(min(worker_count_, len(t_paths))) as executor_:
+            t_frames: list[pd.DataFrame] = list(executor_.map(
+                load_workbook,
+                t_paths,
+                [sheet_name_] * len(t_paths),
+                [cache_directory_] * len(t_paths)
+            ))
+    else:
+        t_frames = [
+            load_workbook(path_, sheet_name_, cache_directory_) for path_ in t_paths
+        ]
+    return pd.concat(t_frames, ignore_index=True) if len(t_frames) > 1 else t_frames[0]